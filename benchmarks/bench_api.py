@@ -0,0 +1,78 @@
+"""
+Benchmark eeapi against the local mock M2M API (see mock_m2m.py), no USGS credentials or network access needed.
+Times retrieve_search_results and get_download_links for synthetic archives of different sizes.
+
+    python benchmarks/bench_api.py --sizes 1000,10000,100000 --latency 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from landsatlinks.eeapi import eeapi  # noqa: E402
+from landsatlinks.ratelimit import SceneRateLimiter  # noqa: E402
+from mock_m2m import MockM2M, SyntheticArchive  # noqa: E402
+
+
+def run_benchmark(n_scenes: int, latency: float, n_workers: int, stream: bool, preparing_share: float) -> dict:
+    archive = SyntheticArchive(n_scenes)
+    server = MockM2M(archive, latency=latency, preparing_share=preparing_share, prepare_seconds=0.5).start()
+    try:
+        api = eeapi(
+            'user', 'token', use_login_token=True, n_workers=n_workers, stream_responses=stream,
+            endpoint=server.endpoint, rate_limiter=SceneRateLimiter(max_scenes=10 ** 9)
+        )
+        t0 = time.perf_counter()
+        products = api.retrieve_search_results(
+            datasetName='landsat_ot_c2_l1', data_type_l1='L1TP', tier='T1',
+            start='1980-01-01', end='2025-01-01', seasonalFilter=None, ingestFilter=None,
+            minCC=-1, maxCC=100, prList=archive.tiles
+        )
+        t1 = time.perf_counter()
+        urls = api.get_download_links(products, poll_interval=0.2)
+        t2 = time.perf_counter()
+        api.logout()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if len(products) != n_scenes or len(urls) != n_scenes:
+        raise RuntimeError(f'Expected {n_scenes} products/urls, got {len(products)}/{len(urls)}')
+    return {
+        'scenes': n_scenes,
+        'search_s': round(t1 - t0, 3),
+        'links_s': round(t2 - t1, 3),
+        'requests': server.stats['requests'],
+        'mbytes': round(server.stats['bytes'] / 1024 ** 2, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark eeapi against a local mock M2M API.')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='Comma-separated archive sizes.')
+    parser.add_argument('--latency', type=float, default=0.02, help='Seconds added to every mock API request.')
+    parser.add_argument('--workers', type=int, default=4, help='eeapi n_workers.')
+    parser.add_argument('--stream', action='store_true', help='Use streaming response parsing (--low-memory).')
+    parser.add_argument('--preparing-share', type=float, default=0,
+                        help='Share of downloads returned as preparingDownloads.')
+    parser.add_argument('--json', help='Write results to this JSON file, e.g. to compare runs.')
+    args = parser.parse_args()
+
+    results = []
+    print(f'{"scenes":>8} {"search [s]":>11} {"links [s]":>10} {"requests":>9} {"MB":>8}')
+    for size in [int(s) for s in args.sizes.split(',')]:
+        result = run_benchmark(size, args.latency, args.workers, args.stream, args.preparing_share)
+        results.append(result)
+        print(f'{result["scenes"]:>8} {result["search_s"]:>11} {result["links_s"]:>10} '
+              f'{result["requests"]:>9} {result["mbytes"]:>8}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark utils.find_files on a synthetic output directory with product bundles (.tar, .tar.gz, extracted folders
+with band files), partial downloads (.aria2), and FORCE logs spread over nested subdirectories.
+
+    python benchmarks/bench_scan.py --products 100000 --workers 8
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landsatlinks import utils  # noqa: E402
+
+
+def create_tree(root: str, n_products: int, bands: int) -> None:
+    for i in range(n_products):
+        product_id = f'LC08_L1TP_{i % 233 + 1:03d}{i // 233 % 248 + 1:03d}_{2013 + i // 57784:04d}0101_20200101_02_T1'
+        directory = os.path.join(root, f'{i % 233 + 1:03d}', f'{i // 233 % 248 + 1:03d}')
+        os.makedirs(directory, exist_ok=True)
+        kind = i % 4
+        if kind == 0:
+            open(os.path.join(directory, f'{product_id}.tar'), 'w').close()
+        elif kind == 1:
+            open(os.path.join(directory, f'{product_id}.tar'), 'w').close()
+            open(os.path.join(directory, f'{product_id}.tar.aria2'), 'w').close()
+        elif kind == 2:
+            os.makedirs(os.path.join(directory, product_id))
+            for band in range(bands):
+                open(os.path.join(directory, product_id, f'{product_id}_B{band}.TIF'), 'w').close()
+        else:
+            open(os.path.join(directory, f'{product_id}.log'), 'w').close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark scanning the file system for existing product bundles.')
+    parser.add_argument('--products', type=int, default=20000, help='Number of synthetic products.')
+    parser.add_argument('--bands', type=int, default=12, help='Files per extracted product bundle.')
+    parser.add_argument('--workers', type=int, default=8, help='find_files n_workers.')
+    parser.add_argument('--runs', type=int, default=3, help='Number of runs, the fastest is reported.')
+    parser.add_argument('--dir', help='Scan this existing directory instead of a synthetic one.')
+    parser.add_argument('--json', help='Write results to this JSON file, e.g. to compare runs.')
+    args = parser.parse_args()
+
+    root = args.dir or tempfile.mkdtemp(prefix='landsatlinks_bench_')
+    try:
+        if not args.dir:
+            create_tree(root, args.products, args.bands)
+        results = {}
+        print(f'{"search type":<12} {"workers":>8} {"found":>8} {"time [s]":>9}')
+        for search_type in ('product', 'log'):
+            for n_workers in sorted({1, args.workers}):
+                times = []
+                for _ in range(args.runs):
+                    t0 = time.perf_counter()
+                    found = utils.find_files(root, search_type, n_workers=n_workers)
+                    times.append(time.perf_counter() - t0)
+                results[f'{search_type}_{n_workers}'] = {'found': len(found), 'seconds': round(min(times), 3)}
+                print(f'{search_type:<12} {n_workers:>8} {len(found):>8} {round(min(times), 3):>9}')
+    finally:
+        if not args.dir:
+            shutil.rmtree(root)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark the cold start of the command line interface, e.g. for many short cron invocations.
+Runs a few commands that exit right after argument parsing in fresh interpreters, reports their wall time, and
+checks that heavy modules are only imported by the code paths that need them.
+
+    python benchmarks/bench_startup.py --runs 20 --max-ms 300
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = {
+    'version': ['--version'],
+    'search help': ['search', '--help'],
+    'download help': ['download', '--help'],
+}
+# modules that must not be imported when loading the command line interface
+LAZY_MODULES = ['osgeo', 'pkg_resources', 'requests', 'tqdm', 'multiprocessing', 'landsatlinks.eeapi']
+
+
+def time_command(args: list, runs: int) -> list:
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))}
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'landsatlinks', *args], env=env, cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t0) * 1000)
+    return times
+
+
+def eagerly_imported() -> list:
+    """Heavy modules imported by 'import landsatlinks.cli'."""
+    code = (
+        'import sys, landsatlinks.cli; '
+        f'print(" ".join(m for m in {LAZY_MODULES!r} if m in sys.modules))'
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr)
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the landsatlinks CLI.')
+    parser.add_argument('--runs', type=int, default=10, help='Number of runs per command.')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='Exit with an error if the median startup time of a command exceeds this.')
+    parser.add_argument('--json', help='Write results to this JSON file, e.g. to compare runs.')
+    args = parser.parse_args()
+
+    interpreter = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'])
+        interpreter.append((time.perf_counter() - t0) * 1000)
+
+    results = {'python': round(statistics.median(interpreter), 1)}
+    print(f'{"command":<16} {"median [ms]":>12} {"min [ms]":>9}')
+    print(f'{"python -c pass":<16} {results["python"]:>12} {round(min(interpreter), 1):>9}')
+    failed = False
+    for name, command in COMMANDS.items():
+        times = time_command(command, args.runs)
+        results[name] = round(statistics.median(times), 1)
+        print(f'{name:<16} {results[name]:>12} {round(min(times), 1):>9}')
+        if args.max_ms is not None and results[name] > args.max_ms:
+            failed = True
+
+    eager = eagerly_imported()
+    results['eager_imports'] = eager
+    if eager:
+        print(f'Heavy modules imported at startup: {", ".join(eager)}')
+        failed = True
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+Local stand-in for the USGS M2M API serving a synthetic Landsat archive.
+Implements login, login-token, scene-search, download-options, download-request, download-retrieve, and logout
+with configurable archive size, latency, share of downloads being prepared, and rate limiting.
+
+Run standalone:
+    python benchmarks/mock_m2m.py --scenes 10000 --latency 0.05 --port 8080
+and point the client to it:
+    eeapi(user, token, endpoint='http://127.0.0.1:8080/api/api/json/stable/')
+"""
+import argparse
+import bisect
+import gzip
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# metadata filter IDs, see eeapi.M2MFilters.create_child_filters
+PATH_FILTER = '5e81f14f8faf8048'
+ROW_FILTER = '5e81f14f8d2a7c24'
+CLOUD_FILTER = '5f6aa1a4e0985d4c'
+BUNDLE = 'Landsat Collection 2 Level-1 Product Bundle'
+
+
+class SyntheticArchive:
+    """
+    n_scenes scenes distributed evenly over the tiles and dates between start and end.
+    Scenes are generated on the fly from their index, so even large archives need little memory.
+    """
+
+    def __init__(self, n_scenes: int, tiles: list = None, start: date = date(1985, 1, 1), end: date = date(2024, 12, 31)):
+        self.n_scenes = n_scenes
+        self.tiles = sorted(tiles or [f'{p:03d}{r:03d}' for p in range(190, 195) for r in range(22, 26)])
+        self.start = start
+        self.days = (end - start).days
+        self.per_tile = -(-n_scenes // len(self.tiles))
+        self.entity_ids = {self.scene(i)['entityId']: i for i in range(n_scenes)}
+        self.searches = {}
+
+    def scene(self, i: int) -> dict:
+        tile = self.tiles[i // self.per_tile]
+        k = i % self.per_tile
+        acq = self.start + timedelta(days=k * self.days // max(self.per_tile, 1))
+        ymd = acq.strftime('%Y%m%d')
+        display_id = f'LC08_L1TP_{tile}_{ymd}_{ymd}_02_T1'
+        # rough footprint, ~2° per path and row
+        lon, lat = (190 - int(tile[:3])) * 2.0 + 10, 60 - int(tile[3:]) * 1.5
+        return {
+            'entityId': f'LC8{tile}{acq.strftime("%Y%j")}LGN{i % 100:02d}',
+            'displayId': display_id,
+            'cloudCover': (i * 37) % 101,
+            'publishDate': f'{(acq + timedelta(days=20)).isoformat()} 00:00:00',
+            'spatialCoverage': {'type': 'Polygon', 'coordinates': [[
+                [lon, lat], [lon + 2.4, lat + 0.4], [lon + 2.0, lat + 2.2], [lon - 0.4, lat + 1.8], [lon, lat]
+            ]]},
+            'index': i,
+            'metadata': [{'fieldName': 'filler', 'value': 'x' * 64}],
+        }
+
+    def tile_range(self, tile: str) -> range:
+        t = bisect.bisect_left(self.tiles, tile)
+        if t == len(self.tiles) or self.tiles[t] != tile:
+            return range(0)
+        return range(t * self.per_tile, min((t + 1) * self.per_tile, self.n_scenes))
+
+    def search(self, scene_filter: dict) -> list:
+        """Indices of scenes matching acquisition date, months, ingest date, path/row, and cloud cover filters."""
+        key = json.dumps(scene_filter, sort_keys=True)
+        if key not in self.searches:
+            self.searches[key] = self.filter_scenes(scene_filter)
+        return self.searches[key]
+
+    def filter_scenes(self, scene_filter: dict) -> list:
+        acq = scene_filter.get('acquisitionFilter', {})
+        start = acq.get('start', '0000-00-00').replace('-', '')
+        end = acq.get('end', '9999-99-99').replace('-', '')
+        months = set(scene_filter.get('seasonalFilter') or range(1, 13))
+        ingest = scene_filter.get('ingestFilter', {})
+        ingest_start = ingest.get('start', '0000-00-00')
+        ingest_end = ingest.get('end', '9999-99-99')
+        between = {
+            f['filterId']: (float(f['firstValue']), float(f['secondValue']))
+            for f in scene_filter.get('metadataFilter', {}).get('childFilters', []) if f['filterType'] == 'between'
+        }
+        p_min, p_max = between.get(PATH_FILTER, (0, 999))
+        r_min, r_max = between.get(ROW_FILTER, (0, 999))
+        cc_min, cc_max = between.get(CLOUD_FILTER, (-1, 100))
+
+        indices = []
+        for tile in self.tiles:
+            if not (p_min <= int(tile[:3]) <= p_max and r_min <= int(tile[3:]) <= r_max):
+                continue
+            for i in self.tile_range(tile):
+                scene = self.scene(i)
+                if not start <= scene['displayId'][17:25] <= end or int(scene['displayId'][21:23]) not in months:
+                    continue
+                if ingest_start <= scene['publishDate'][:10] <= ingest_end and cc_min <= scene['cloudCover'] <= cc_max:
+                    indices.append(i)
+        return indices
+
+
+class MockM2M(ThreadingHTTPServer):
+    """
+    HTTP server answering M2M API requests from a SyntheticArchive.
+    :param latency: seconds added to every request
+    :param preparing_share: share of downloads returned as preparingDownloads, ready after prepare_seconds
+    :param rate_limit: scenes per rate_window seconds for download-options/download-request, None to disable
+    """
+    daemon_threads = True
+
+    def __init__(self, archive: SyntheticArchive, host: str = '127.0.0.1', port: int = 0, latency: float = 0,
+                 preparing_share: float = 0, prepare_seconds: float = 1,
+                 rate_limit: int = None, rate_window: float = 900):
+        super().__init__((host, port), MockHandler)
+        self.archive = archive
+        self.latency = latency
+        self.preparing_share = preparing_share
+        self.prepare_seconds = prepare_seconds
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.rate_events = []
+        self.labels = {}
+        self.api_keys = set()
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes': 0, 'logins': 0}
+
+    @property
+    def endpoint(self) -> str:
+        return f'http://{self.server_address[0]}:{self.server_address[1]}/api/api/json/stable/'
+
+    def start(self) -> 'MockM2M':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def rate_limited(self, n: int) -> bool:
+        if self.rate_limit is None:
+            return False
+        with self.lock:
+            now = time.time()
+            self.rate_events = [(t, c) for t, c in self.rate_events if t > now - self.rate_window]
+            if sum(c for _, c in self.rate_events) + n > self.rate_limit:
+                return True
+            self.rate_events.append((now, n))
+            return False
+
+    def expire_api_keys(self) -> None:
+        """Invalidate all API keys, e.g. to test logging in again."""
+        with self.lock:
+            self.api_keys.clear()
+
+    def handle_api(self, code: str, params: dict, api_key: str = None):
+        """:return: data of the response, raises KeyError for unknown endpoints and PermissionError for invalid keys"""
+        if code in ('login', 'login-token'):
+            with self.lock:
+                self.stats['logins'] += 1
+                api_key = f'mock-api-key-{self.stats["logins"]}'
+                self.api_keys.add(api_key)
+            return api_key
+        if api_key not in self.api_keys:
+            raise PermissionError(code)
+        if code == 'logout':
+            with self.lock:
+                self.api_keys.discard(api_key)
+            return None
+        if code == 'scene-search':
+            indices = self.archive.search(params.get('sceneFilter', {}))
+            first = params.get('startingNumber', 1)
+            page = indices[first - 1:first - 1 + params.get('maxResults', 100)]
+            return {
+                'results': [self.archive.scene(i) for i in page],
+                'recordsReturned': len(page),
+                'totalHits': len(indices),
+                'startingNumber': first,
+                'nextRecord': first + len(page),
+            }
+        if code == 'download-options':
+            options = []
+            for entity_id in params['entityIds']:
+                i = self.index(entity_id)
+                display_id = self.archive.scene(i)['displayId']
+                for name, product_id in ((BUNDLE, f'b{i}'), ('Level-1 Band File', f'f{i}')):
+                    options.append({
+                        'id': product_id, 'entityId': entity_id, 'displayId': display_id,
+                        'productName': name, 'available': True, 'filesize': 900000000 + i,
+                    })
+            return options
+        if code == 'download-request':
+            available, preparing = [], []
+            label = params.get('label')
+            for n, download in enumerate(params['downloads']):
+                i = int(download['productId'][1:])
+                entry = {
+                    'downloadId': i, 'eulaCode': None,
+                    'url': f'https://dds.cr.usgs.gov/download/{self.archive.scene(i)["displayId"]}',
+                }
+                if n < len(params['downloads']) * self.preparing_share:
+                    preparing.append(entry)
+                    with self.lock:
+                        self.labels.setdefault(label, []).append((time.time() + self.prepare_seconds, entry))
+                else:
+                    available.append(entry)
+            return {'availableDownloads': available, 'preparingDownloads': preparing, 'failed': []}
+        if code == 'download-retrieve':
+            with self.lock:
+                entries = self.labels.get(params.get('label'), [])
+            now = time.time()
+            return {
+                'available': [entry for ready, entry in entries if ready <= now],
+                'requested': [entry for ready, entry in entries if ready > now],
+            }
+        raise KeyError(code)
+
+    def index(self, entity_id: str) -> int:
+        return self.archive.entity_ids[entity_id]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        code = self.path.rstrip('?').rsplit('/', 1)[-1]
+        params = json.loads(body) if body else {}
+
+        n_scenes = len(params.get('entityIds', [])) or len(params.get('downloads', []))
+        if code in ('download-options', 'download-request') and server.rate_limited(n_scenes):
+            response = {'data': None, 'errorCode': 'RATE_LIMIT_USER_DL',
+                        'errorMessage': 'Rate limit exceeded'}
+        else:
+            try:
+                data = server.handle_api(code, params, self.headers.get('X-Auth-Token'))
+                response = {'data': data, 'errorCode': None, 'errorMessage': None}
+            except KeyError as e:
+                response = {'data': None, 'errorCode': 'NOT_FOUND', 'errorMessage': f'Unknown: {e}'}
+            except PermissionError:
+                response = {'data': None, 'errorCode': 'AUTH_INVALID', 'errorMessage': 'Invalid API key'}
+
+        payload = json.dumps(response).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=1)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with server.lock:
+            server.stats['requests'] += 1
+            server.stats['bytes'] += len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the USGS M2M API serving a synthetic archive.')
+    parser.add_argument('--scenes', type=int, default=10000, help='Number of scenes in the archive.')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='Seconds added to every request.')
+    parser.add_argument('--preparing-share', type=float, default=0,
+                        help='Share of downloads returned as preparingDownloads.')
+    parser.add_argument('--rate-limit', type=int, default=None, help='Scenes per 15 minutes, default: no limit.')
+    args = parser.parse_args()
+
+    server = MockM2M(
+        SyntheticArchive(args.scenes), port=args.port, latency=args.latency,
+        preparing_share=args.preparing_share, rate_limit=args.rate_limit
+    )
+    print(f'Mock M2M API serving {args.scenes} scenes at {server.endpoint}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import asyncio
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from landsatlinks import ratelimit
+from landsatlinks.eeapi import ENDPOINT, M2MApiError, M2MFilters, RETRY_ENDPOINTS, json_dumps, json_loads
+from landsatlinks.products import ProductCollection
+from landsatlinks.retry import RetryPolicy
+
+
+class aioeeapi(M2MFilters):
+    """
+    asyncio client for the M2M API with the same methods as eeapi.eeapi.
+    All requests share one aiohttp session and at most max_concurrency requests are in flight at the same time,
+    so many searches can run concurrently on one event loop. Requires aiohttp (pip install landsatlinks[async]).
+
+    Usage:
+        async with aioeeapi(user, token) as api:
+            products = await api.retrieve_search_results(...)
+            urls = await api.get_download_links(products)
+    """
+
+    def __init__(self, user: str, password: str, use_login_token: bool = True,
+                 max_concurrency: int = 4, retry_policy: RetryPolicy = None,
+                 rate_limiter: ratelimit.SceneRateLimiter = None, endpoint: str = ENDPOINT):
+        if aiohttp is None:
+            raise ImportError('aioeeapi requires aiohttp. Install with: pip install landsatlinks[async]')
+        self.endpoint = endpoint
+        self.user = user
+        self.password = password
+        self.use_login_token = use_login_token
+        self.max_concurrency = max(1, max_concurrency)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter or ratelimit.SceneRateLimiter()
+        self.semaphore = None
+        self.session = None
+        self.key = None
+
+    async def __aenter__(self):
+        await self.login(self.user, self.password, self.use_login_token)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.logout()
+
+    async def login(self, user: str, password: str, use_login_token: bool = True) -> str:
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.session = aiohttp.ClientSession(
+            headers={'Content-Type': 'application/json'},
+            connector=aiohttp.TCPConnector(limit=self.max_concurrency)
+        )
+        login_endpoint, loginData = self.create_login_params(user, password, use_login_token)
+        try:
+            response = await self.post(f'{self.endpoint}{login_endpoint}', loginData, retry=True)
+            if response.get('errorCode', None):
+                raise M2MApiError(response['errorCode'], response['errorMessage'])
+        except BaseException:
+            # __aexit__ is not called if __aenter__ fails, the session would be left open
+            await self.session.close()
+            self.session = None
+            raise
+        self.key = response['data']
+        return self.key
+
+    async def logout(self) -> None:
+        if self.session is None:
+            return
+        try:
+            await self.request('logout')
+        except M2MApiError:
+            pass
+        await self.session.close()
+        self.session = None
+
+    async def post(self, url: str, data: bytes, headers: dict = None, retry: bool = False) -> dict:
+        """
+        Send a POST request and decode the JSON response, see eeapi.eeapi.post.
+        :raises M2MApiError: if the request failed and retries are exhausted
+        """
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    async with self.session.post(url, data=data, headers=headers) as r:
+                        if r.status >= 500 or r.status == 429:
+                            raise M2MApiError(f'HTTP_{r.status}', r.reason)
+                        return json_loads(await r.read())
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, M2MApiError) as e:
+                error = e if isinstance(e, M2MApiError) else M2MApiError(type(e).__name__, str(e))
+                if not retry or attempt >= self.retry_policy.max_retries:
+                    raise error
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+
+    async def request(self, request_code: str, **kwargs):
+        """
+        Send a request to the machine2machine API, see eeapi.eeapi.request.
+        :raises M2MApiError: if the API returned an error or the request failed
+        :return: API response data
+        """
+        if request_code == 'download-options':
+            await asyncio.sleep(self.rate_limiter.reserve(len(kwargs.get('entityIds', []))))
+        elif request_code == 'download-request':
+            await asyncio.sleep(self.rate_limiter.reserve(len(kwargs.get('downloads', []))))
+
+        url = f'{self.endpoint}{request_code}'
+        params = json_dumps(kwargs)
+        headers = {'X-Auth-Token': self.key}
+        retry = request_code in RETRY_ENDPOINTS
+        response = await self.post(url, params, headers=headers, retry=retry)
+        if response.get('errorCode', None) == 'RATE_LIMIT_USER_DL':
+            await asyncio.sleep(905)
+            response = await self.post(url, params, headers=headers, retry=retry)
+        if response.get('errorCode', None):
+            raise M2MApiError(response['errorCode'], response['errorMessage'])
+        return response['data']
+
+    async def scene_search(self, page_size: int = 10000, max_results: int = None, **kwargs) -> list:
+        """
+        Search for scenes matching search criteria, see eeapi.eeapi.scene_search.
+        :return: List containing one dict per scene
+        """
+        searchParams = self.create_search_params(**kwargs)
+        scenes = []
+        startingNumber = 1
+        while max_results is None or len(scenes) < max_results:
+            n_request = page_size if max_results is None else min(page_size, max_results - len(scenes))
+            searchParams.update(startingNumber=startingNumber, maxResults=n_request)
+            response = await self.request('scene-search', **searchParams)
+            results = response.get('results') or []
+            if not results:
+                break
+            scenes.extend(results)
+            nextRecord = response.get('nextRecord') or startingNumber + len(results)
+            if nextRecord <= startingNumber or nextRecord > (response.get('totalHits') or 0):
+                break
+            startingNumber = nextRecord
+        return scenes
+
+    async def get_download_options(self, dataset_name: str, scene_ids: list) -> ProductCollection:
+        """
+        Retrieve download options for chunks of 5000 scenes concurrently, filter out the product bundles.
+        :return: ProductCollection
+        """
+        responses = await asyncio.gather(*[
+            self.request('download-options', datasetName=dataset_name, entityIds=scene_ids[i:i + 5000])
+            for i in range(0, len(scene_ids), 5000)
+        ])
+        return self.filter_product_bundles([option for response in responses for option in response])
+
+    async def retrieve_search_results(self, datasetName, data_type_l1, tier,
+                                      start, end, seasonalFilter, ingestFilter,
+                                      minCC, maxCC, prList, spatialFilter=None,
+                                      coverageFilter=None) -> ProductCollection:
+        """
+        Combine scene_search and get_download_options, see eeapi.eeapi.retrieve_search_results.
+        :return: ProductCollection
+        """
+        scenes = await self.scene_search(
+            dataset_name=datasetName, pr_list=prList,
+            start=start, end=end, seasonal_filter=seasonalFilter,
+            ingest_filter=ingestFilter, spatial_filter=spatialFilter,
+            min_cc=minCC, max_cc=maxCC,
+            data_type_l1=data_type_l1, tier=tier
+        )
+        pr_set = set(prList)
+        legacyIds = [
+            s['entityId'] for s in scenes
+            if s['displayId'][10:16] in pr_set and (coverageFilter is None or coverageFilter(s))
+        ]
+        return await self.get_download_options(datasetName, legacyIds)
+
+    async def get_download_links(self, dl_product_ids) -> list:
+        """
+        Retrieve download links for chunks of 1000 product bundles concurrently.
+        :param dl_product_ids: ProductCollection, or list of dicts with entityId and productId
+        :return: List of download urls
+        """
+        downloads = dl_product_ids.to_downloads() \
+            if isinstance(dl_product_ids, ProductCollection) else dl_product_ids
+        responses = await asyncio.gather(*[
+            self.request('download-request', downloads=downloads[i:i + 1000])
+            for i in range(0, len(downloads), 1000)
+        ])
+        return [
+            download['url']
+            for response in responses
+            for download in response['availableDownloads'] + response['preparingDownloads']
+        ]
@@ -1,29 +1,119 @@
-from osgeo import ogr, osr
-from pkg_resources import resource_filename
+import csv
+import json
+import os
+import sqlite3
 
-from landsatlinks import utils
+from landsatlinks import cache, utils, wrs2index
 
-WRS2_FP = resource_filename('landsatlinks', 'assets/landsat_wrs2.gpkg')
+# GDAL (osgeo) is only imported by the methods handling vector AOIs, so tile lists can be used without loading it
+WRS2_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'landsat_wrs2.gpkg')
+# Simplification tolerance (degrees) applied to vector AOIs before intersecting them with the WRS-2 grid.
+# Far below the size of a WRS-2 tile (~185 km), so the tiles found don't change, but removes the vertex detail of
+# e.g. field or parcel datasets.
+FOOTPRINT_SIMPLIFY_TOLERANCE = 0.001
+# column names recognized in the header of point CSV files
+LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'x')
+LAT_COLUMNS = ('lat', 'latitude', 'y')
 
 
 class Aoi:
-    def __init__(self, fp):
-        self.fp = fp
+    def __init__(self, fp: str = None, bbox: str = None, points: str = None):
+        """
+        :param fp: tile list (.txt), point CSV (.csv), or vector file
+        :param bbox: bounding box 'lon_min,lat_min,lon_max,lat_max' instead of a file
+        :param points: point CSV file with any file extension
+        """
+        self.fp = points or fp
+        self.bbox = None
+        if bbox is not None:
+            self.bbox = self.parse_bbox(bbox)
+            self.type = 'bbox'
+            return
         utils.validate_file_paths(self.fp, 'aoi', file=True, write=False)
-        self.type = self.determine_aoi_type()
+        self.type = 'points' if points else self.determine_aoi_type()
 
     def determine_aoi_type(self):
         if self.fp.endswith('.txt'):
             return 'txt'
+        elif self.fp.endswith('.csv'):
+            return 'points'
         elif self.fp.endswith(('.shp', '.gpkg', '.geojson')):
             return 'vector'
         else:
             print(
                 'Error: invalid file extension. Please use one of the following:\n'
                 '.txt - text file containing one tile per line in the format PPPRRR (P = path, R = row)\n'
+                '.csv - text file containing one longitude,latitude point per line\n'
                 '.shp, .gpkg, .geojson - vector file containing point, line, or polygon geometries.')
             exit(1)
 
+    @staticmethod
+    def parse_bbox(bbox: str) -> tuple:
+        """
+        :param bbox: 'lon_min,lat_min,lon_max,lat_max' or a list of the four values, lon_min > lon_max for boxes
+        crossing the antimeridian
+        :return: tuple of floats
+        """
+        try:
+            values = bbox.split(',') if isinstance(bbox, str) else bbox
+            lon_min, lat_min, lon_max, lat_max = [float(value) for value in values]
+        except (TypeError, ValueError):
+            print(f'Error: invalid bounding box {bbox}. Expected format: lon_min,lat_min,lon_max,lat_max')
+            exit(1)
+        if not (-180 <= lon_min <= 180 and -180 <= lon_max <= 180 and -90 <= lat_min <= lat_max <= 90):
+            print(f'Error: invalid bounding box {bbox}. Longitudes must be between -180 and 180, latitudes between '
+                  f'-90 and 90, and lat_min must not be larger than lat_max.')
+            exit(1)
+        return lon_min, lat_min, lon_max, lat_max
+
+    def read_points(self) -> list:
+        """
+        Read the points of a CSV file. Longitude and latitude columns are found by their name if the file has a
+        header (see LON_COLUMNS, LAT_COLUMNS), otherwise the first two columns are longitude, latitude.
+        :return: list of (lon, lat) tuples
+        """
+        with open(self.fp, newline='') as file:
+            rows = [row for row in csv.reader(file) if any(value.strip() for value in row)]
+        if not rows:
+            print(f'Error: no points found in {self.fp}.')
+            exit(1)
+        lon_col, lat_col = 0, 1
+        try:
+            float(rows[0][0])
+        except ValueError:
+            header = [value.strip().lower() for value in rows.pop(0)]
+            lon_col = next((i for i, name in enumerate(header) if name in LON_COLUMNS), None)
+            lat_col = next((i for i, name in enumerate(header) if name in LAT_COLUMNS), None)
+            if lon_col is None or lat_col is None:
+                print(f'Error: no longitude and latitude columns found in the header of {self.fp}.\n'
+                      f'Valid column names: {", ".join(LON_COLUMNS)} and {", ".join(LAT_COLUMNS)}')
+                exit(1)
+
+        points = []
+        for n, row in enumerate(rows, 1):
+            try:
+                lon, lat = float(row[lon_col]), float(row[lat_col])
+            except (ValueError, IndexError):
+                print(f'Error: invalid point in row {n} of {self.fp}: {",".join(row)}')
+                exit(1)
+            if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+                print(f'Error: point out of range in row {n} of {self.fp}: {lon},{lat}')
+                exit(1)
+            points.append((lon, lat))
+        return points
+
+    def prlist_from_points(self):
+        pr_list = wrs2index.load_index().tiles_at_points(self.read_points())
+        if not pr_list:
+            print('Error: AOI does not seem to intersect with WRS2 grid. Please check your input data.')
+        return sorted(pr_list)
+
+    def prlist_from_bbox(self):
+        pr_list = wrs2index.load_index().tiles_in_bbox(*self.bbox)
+        if not pr_list:
+            print('Error: AOI does not seem to intersect with WRS2 grid. Please check your input data.')
+        return sorted(pr_list)
+
     def prlist_from_txt(self):
         with open(self.fp) as file:
             pr_list = [line.rstrip() for line in file if line.strip()]
@@ -35,86 +125,318 @@ class Aoi:
         return sorted(pr_list)
 
     def prlist_from_vector(self):
+        try:
+            from osgeo import ogr
+        except ImportError:
+            print('Error: GDAL is required for vector AOIs. Use a tile list, --bbox, or --points without GDAL.')
+            exit(1)
+
         wrs_ds = ogr.Open(WRS2_FP)
         wrs_layer = wrs_ds.GetLayer()
-        aoi_ds = ogr.Open(self.fp)
-        if not wrs_layer.GetSpatialRef().IsSame(aoi_ds.GetLayer().GetSpatialRef()):
-            aoi_ds = self.reproject(aoi_ds, wrs_layer.GetSpatialRef())
-
-        intersection_ds = self.intersect(aoi_ds, wrs_ds)
-        intersection = intersection_ds.GetLayer()
+        wrs_srs = wrs_layer.GetSpatialRef()
+        # transform, dissolve, and simplify the AOI, the WRS-2 grid is never reprojected
+        tolerance = FOOTPRINT_SIMPLIFY_TOLERANCE if wrs_srs.IsGeographic() else FOOTPRINT_SIMPLIFY_TOLERANCE * 111000
+        geometry = self.get_geometry(simplify_tolerance=tolerance, target_srs=wrs_srs)
+        multi_types = (ogr.wkbMultiPoint, ogr.wkbMultiLineString, ogr.wkbMultiPolygon, ogr.wkbGeometryCollection)
+        if ogr.GT_Flatten(geometry.GetGeometryType()) in multi_types:
+            parts = [geometry.GetGeometryRef(i) for i in range(geometry.GetGeometryCount())]
+        else:
+            parts = [geometry]
 
-        if intersection.GetFeatureCount() == 0:
+        pr_list = self.intersecting_footprints(parts, wrs_layer)
+        if not pr_list:
             print('Error: AOI does not seem to intersect with WRS2 grid. Please check your input data.')
 
-        pr_list = []
-        feat = intersection.GetNextFeature()
+        return sorted(pr_list)
+
+    @staticmethod
+    def intersecting_footprints(geometries: list, wrs_layer) -> set:
+        """
+        Find the WRS-2 footprints intersecting any of the AOI geometries.
+        Candidate footprints are selected by the envelope of each AOI geometry using the spatial index (R-tree) of
+        the WRS-2 GeoPackage, so the exact intersection test only runs on footprints close to the AOI. Footprints
+        that already matched are not tested again for further AOI geometries.
+        :param geometries: list of ogr.Geometry in the SRS of the WRS-2 grid, e.g. the parts of the dissolved AOI
+        :param wrs_layer: ogr.Layer of the WRS-2 grid
+        :return: set of PRFIDs (PPPRRR)
+        """
+        pr_set = set()
+        for geom in geometries:
+            if not geom.IsEmpty():
+                min_x, max_x, min_y, max_y = geom.GetEnvelope()
+                wrs_layer.SetSpatialFilterRect(min_x, min_y, max_x, max_y)
+                wrs_layer.ResetReading()
+                wrs_feat = wrs_layer.GetNextFeature()
+                while wrs_feat:
+                    prfid = wrs_feat.GetField('PRFID')
+                    if prfid not in pr_set and geom.Intersects(wrs_feat.GetGeometryRef()):
+                        pr_set.add(prfid)
+                    wrs_feat = wrs_layer.GetNextFeature()
+        wrs_layer.SetSpatialFilter(None)
+        return pr_set
+
+    def get_geometry(self, simplify_tolerance: float = 0.01, target_srs=None):
+        """
+        Union of all AOI geometries, transformed to the target SRS and simplified to the given tolerance.
+        :param simplify_tolerance: simplification tolerance in units of the target SRS, no simplification if 0
+        :param target_srs: osr.SpatialReference, defaults to EPSG:4326 (lon/lat axis order)
+        :return: ogr.Geometry
+        """
+        from osgeo import ogr, osr
+
+        if target_srs is None:
+            target_srs = osr.SpatialReference()
+            target_srs.ImportFromEPSG(4326)
+        else:
+            target_srs = target_srs.Clone()
+        target_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+        aoi_ds = ogr.Open(self.fp)
+        aoi_layer = aoi_ds.GetLayer()
+        source_srs = aoi_layer.GetSpatialRef()
+        transform = None
+        if source_srs and not source_srs.IsSame(target_srs):
+            source_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            transform = osr.CoordinateTransformation(source_srs, target_srs)
+
+        geometries = []
+        feat = aoi_layer.GetNextFeature()
         while feat:
-            pr_list.append(feat.GetField('PRFID'))
-            feat = intersection.GetNextFeature()
+            geom = feat.GetGeometryRef()
+            if geom is not None and not geom.IsEmpty():
+                geom = geom.Clone()
+                if transform:
+                    geom.Transform(transform)
+                geometries.append(geom)
+            feat = aoi_layer.GetNextFeature()
+        aoi_ds = None
+
+        if not geometries:
+            print('Error: AOI does not contain any geometries. Please check your input data.')
+            exit(1)
+        union = self.dissolve(geometries)
+        if simplify_tolerance:
+            union = union.SimplifyPreserveTopology(simplify_tolerance)
+        return union
+
+    @staticmethod
+    def dissolve(geometries: list):
+        """
+        Union of a list of geometries in a single operation instead of merging them one by one.
+        :param geometries: list of ogr.Geometry
+        :return: ogr.Geometry
+        """
+        from osgeo import ogr
 
-        return sorted(list(set(pr_list)))
+        collection = ogr.Geometry(ogr.wkbGeometryCollection)
+        for geom in geometries:
+            collection.AddGeometry(geom)
+        if hasattr(collection, 'UnaryUnion'):
+            # GDAL >= 3.7
+            return collection.UnaryUnion()
+
+        polygons = ogr.Geometry(ogr.wkbMultiPolygon)
+        others = []
+        for geom in geometries:
+            geom_type = ogr.GT_Flatten(geom.GetGeometryType())
+            if geom_type == ogr.wkbPolygon:
+                polygons.AddGeometry(geom)
+            elif geom_type == ogr.wkbMultiPolygon:
+                for i in range(geom.GetGeometryCount()):
+                    polygons.AddGeometry(geom.GetGeometryRef(i))
+            else:
+                others.append(geom)
+        union = polygons.UnionCascaded() if polygons.GetGeometryCount() else None
+        for geom in others:
+            union = geom.Clone() if union is None else union.Union(geom)
+        return union
+
+    def spatial_filter(self, mode: str = 'mbr', simplify_tolerance: float = 0.01):
+        """
+        Create a spatialFilter for the M2M scene-search sceneFilter from the AOI.
+        :param mode: 'mbr' - minimum bounding rectangle of the AOI, 'geometry' - simplified AOI geometry
+        :param simplify_tolerance: simplification tolerance in degrees for mode 'geometry'
+        :return: spatialFilter dict, or None for tile list AOIs
+        """
+        if self.type in ('bbox', 'points'):
+            return self.spatial_filter_from_coordinates(mode)
+        if self.type != 'vector':
+            return None
+        if mode == 'mbr':
+            lon_min, lon_max, lat_min, lat_max = self.get_geometry(simplify_tolerance=0).GetEnvelope()
+            return {
+                'filterType': 'mbr',
+                'lowerLeft': {'latitude': lat_min, 'longitude': lon_min},
+                'upperRight': {'latitude': lat_max, 'longitude': lon_max}
+            }
+        elif mode == 'geometry':
+            geometry = self.get_geometry(simplify_tolerance)
+            return {'filterType': 'geojson', 'geoJson': json.loads(geometry.ExportToJson())}
+        else:
+            raise ValueError(f'Error: invalid spatial filter mode. Received {mode}, expected "mbr" or "geometry".')
+
+    def spatial_filter_from_coordinates(self, mode: str = 'mbr'):
+        """spatialFilter of bounding box and point AOIs, created without GDAL."""
+        if self.type == 'bbox':
+            lon_min, lat_min, lon_max, lat_max = self.bbox
+        else:
+            points = self.read_points()
+            lon_min, lat_min = min(lon for lon, _ in points), min(lat for _, lat in points)
+            lon_max, lat_max = max(lon for lon, _ in points), max(lat for _, lat in points)
+        if mode == 'mbr':
+            return {
+                'filterType': 'mbr',
+                'lowerLeft': {'latitude': lat_min, 'longitude': lon_min},
+                'upperRight': {'latitude': lat_max, 'longitude': lon_max}
+            }
+        elif mode == 'geometry':
+            if self.type == 'bbox':
+                geometry = {'type': 'Polygon', 'coordinates': [[
+                    [lon_min, lat_min], [lon_max, lat_min], [lon_max, lat_max], [lon_min, lat_max], [lon_min, lat_min]
+                ]]}
+            else:
+                geometry = {'type': 'MultiPoint', 'coordinates': [list(point) for point in points]}
+            return {'filterType': 'geojson', 'geoJson': geometry}
+        else:
+            raise ValueError(f'Error: invalid spatial filter mode. Received {mode}, expected "mbr" or "geometry".')
+
+    def coverage_filter(self, min_overlap: float):
+        """
+        Create a filter for scene-search results based on the footprint (spatialCoverage) of each scene.
+        Scenes are kept if the overlap of their footprint and the AOI is at least min_overlap times the area of the
+        footprint, or of the AOI if it is smaller. Point and line AOIs keep scenes intersecting them. Scenes without
+        spatialCoverage or crossing the antimeridian are always kept.
+        :param min_overlap: minimum overlap fraction between 0 and 1
+        :return: function taking a scene dict and returning True if the scene is kept, None for tile list AOIs
+        """
+        if self.type == 'txt':
+            return None
+        if self.type == 'vector':
+            from osgeo import ogr
+
+            geometry = self.get_geometry(simplify_tolerance=FOOTPRINT_SIMPLIFY_TOLERANCE)
+            aoiArea = geometry.GetArea()
+
+            def overlaps(footprint: dict) -> bool:
+                footprintGeom = ogr.CreateGeometryFromJson(json.dumps(footprint))
+                if footprintGeom is None:
+                    return True
+                if aoiArea == 0:
+                    return footprintGeom.Intersects(geometry)
+                overlap = footprintGeom.Intersection(geometry).GetArea()
+                return overlap >= min_overlap * min(aoiArea, footprintGeom.GetArea())
+        elif self.type == 'points':
+            points = self.read_points()
+
+            def overlaps(footprint: dict) -> bool:
+                rings = footprint_rings(footprint)
+                return any(ring_contains(ring, lon, lat) for ring in rings for lon, lat in points)
+        else:
+            lon_min, lat_min, lon_max, lat_max = self.bbox
+            if lon_min > lon_max:
+                print('Warning: the footprint overlap filter is not applied to bounding boxes crossing the antimeridian.')
+                return None
+            bboxArea = (lon_max - lon_min) * (lat_max - lat_min)
+
+            def overlaps(footprint: dict) -> bool:
+                rings = footprint_rings(footprint)
+                if bboxArea == 0:
+                    return any(ring_contains(ring, lon_min, lat_min) for ring in rings)
+                overlap = sum(ring_area(clip_ring_to_box(ring, self.bbox)) for ring in rings)
+                return overlap >= min_overlap * min(bboxArea, sum(ring_area(ring) for ring in rings))
+
+        def keep(scene: dict) -> bool:
+            footprint = scene.get('spatialCoverage')
+            if not footprint or not footprint_rings(footprint):
+                return True
+            lons = [lon for ring in footprint_rings(footprint) for lon, _ in ring]
+            if max(lons) - min(lons) > 180:
+                return True
+            return overlaps(footprint)
+
+        return keep
 
     @property
     def get_footprints(self):
         if self.type == 'txt':
             return self.prlist_from_txt()
+        elif self.type == 'points':
+            return self.prlist_from_points()
+        elif self.type == 'bbox':
+            return self.prlist_from_bbox()
         elif self.type == 'vector':
-            return self.prlist_from_vector()
+            return self.cached_prlist_from_vector()
 
-    @staticmethod
-    def reproject(in_ds, target_srs=None):
+    def cached_prlist_from_vector(self):
         """
-        Reproject ogr.DataSource to a target projection
-        :param in_ds: string or ogr.DataSource - path to source ds or ds
-        :param target_srs: osr.SpatialReference - SRS to project to. Defaults to EPSG:4326
-        :return: ogr.DataSource
+        Same as prlist_from_vector, but reuse the tiles found for the same AOI and WRS-2 grid in a previous run
+        (see cache.FootprintCache). Runs without cache if the cache directory is not writeable.
         """
+        try:
+            footprintCache = cache.FootprintCache()
+            key = footprintCache.create_key(self.fp, WRS2_FP)
+            pr_list = footprintCache.get(key)
+        except (OSError, sqlite3.Error):
+            return self.prlist_from_vector()
+        if pr_list is None:
+            pr_list = self.prlist_from_vector()
+            if pr_list:
+                try:
+                    footprintCache.set(key, pr_list)
+                except sqlite3.Error:
+                    pass
+        footprintCache.close()
+        return pr_list
 
-        in_layer = in_ds.GetLayer()
-
-        # set spatial reference and transformation
-        if not target_srs:
-            target_srs = osr.SpatialReference()
-            target_srs.ImportFromEPSG(4326)
-        transform = osr.CoordinateTransformation(in_layer.GetSpatialRef(), target_srs)
-
-        # create layer to copy information into
-        driver = ogr.GetDriverByName('MEMORY')
-        out_ds = driver.CreateDataSource('mem')
-        # checks which geometry type we're looking at automatically layer.GetLayerDefn().GetGeomType()
-        out_layer = out_ds.CreateLayer('', target_srs, in_layer.GetLayerDefn().GetGeomType())
-
-        # apply transformation
-        feat = in_layer.GetNextFeature()
-        while feat:
-            transformed = feat.GetGeometryRef()
-            transformed.Transform(transform)
 
-            geom = ogr.CreateGeometryFromWkb(transformed.ExportToWkb())
-            defn = out_layer.GetLayerDefn()
-            out_feat = ogr.Feature(defn)
-            out_feat.SetGeometry(geom)
-            out_layer.CreateFeature(out_feat)
-            out_feat = None
-            feat = in_layer.GetNextFeature()
+def footprint_rings(footprint: dict) -> list:
+    """Exterior rings of a GeoJSON Polygon or MultiPolygon as lists of (lon, lat) tuples."""
+    if footprint.get('type') == 'Polygon':
+        polygons = [footprint.get('coordinates') or []]
+    elif footprint.get('type') == 'MultiPolygon':
+        polygons = footprint.get('coordinates') or []
+    else:
+        return []
+    return [[(point[0], point[1]) for point in polygon[0]] for polygon in polygons if polygon]
 
-        in_ds = None
 
-        return out_ds
+def ring_area(ring: list) -> float:
+    """Area of a ring (shoelace formula), in square degrees for lon/lat coordinates."""
+    return abs(sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]))) / 2
 
-    @staticmethod
-    def intersect(a_ds, b_ds):
 
-        a_layer = a_ds.GetLayer()
-        b_layer = b_ds.GetLayer()
-        if not a_layer.GetSpatialRef().IsSame(b_layer.GetSpatialRef()):
-            b_layer = None
-            repr_ds = Aoi.reproject(b_ds, a_layer.GetSpatialRef())
-            b_layer = repr_ds.GetLayer()
+def ring_contains(ring: list, x: float, y: float) -> bool:
+    inside = False
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
 
-        out_ds = ogr.GetDriverByName('MEMORY').CreateDataSource('mem')
-        out_layer = out_ds.CreateLayer('', a_layer.GetSpatialRef(), a_layer.GetLayerDefn().GetGeomType())
-        a_layer.Intersection(b_layer, out_layer)
 
-        return out_ds
+def clip_ring_to_box(ring: list, bbox: tuple) -> list:
+    """
+    Clip a ring to a box (Sutherland-Hodgman).
+    :param bbox: lon_min, lat_min, lon_max, lat_max
+    :return: ring of the part of the polygon inside the box, empty if they don't overlap
+    """
+    lon_min, lat_min, lon_max, lat_max = bbox
+    edges = (
+        (lambda p: p[0] >= lon_min, lambda p, q: (lon_min, p[1] + (q[1] - p[1]) * (lon_min - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[0] <= lon_max, lambda p, q: (lon_max, p[1] + (q[1] - p[1]) * (lon_max - p[0]) / (q[0] - p[0]))),
+        (lambda p: p[1] >= lat_min, lambda p, q: (p[0] + (q[0] - p[0]) * (lat_min - p[1]) / (q[1] - p[1]), lat_min)),
+        (lambda p: p[1] <= lat_max, lambda p, q: (p[0] + (q[0] - p[0]) * (lat_max - p[1]) / (q[1] - p[1]), lat_max)),
+    )
+    clipped = list(ring)
+    for inside, intersection in edges:
+        points, clipped = clipped, []
+        for i, point in enumerate(points):
+            previous = points[i - 1]
+            if inside(point):
+                if not inside(previous):
+                    clipped.append(intersection(previous, point))
+                clipped.append(point)
+            elif inside(previous):
+                clipped.append(intersection(previous, point))
+        if not clipped:
+            break
+    return clipped
@@ -0,0 +1,294 @@
+import json
+import os
+import re
+from datetime import date, datetime
+
+from landsatlinks import aoi, cache, download, utils
+from landsatlinks.products import ProductCollection
+from landsatlinks.trace import tracer
+
+DATASETS = {'TM': 'landsat_tm_c2_l1', 'ETM': 'landsat_etm_c2_l1', 'OLI': 'landsat_ot_c2_l1'}
+# same defaults as landsatlinks search
+JOB_DEFAULTS = {
+    'name': None,
+    'aoi': None,
+    'bbox': None,
+    'points': None,
+    'output_dir': None,
+    'sensor': 'TM,ETM,OLI',
+    'daterange': None,
+    'cloudcover': '-1,100',
+    'months': '1,2,3,4,5,6,7,8,9,10,11,12',
+    'ingestrange': None,
+    'tier': 'T1',
+    'level': 'L1TP',
+    'forcelogs': None,
+    'queue_file': None,
+    'url_file': None,
+    'download': False,
+}
+
+
+def load_jobs(fp: str) -> list:
+    """
+    Load and validate a batch job file.
+    The job file is a JSON file containing a list of jobs, or an object with the keys 'defaults' (settings shared by
+    all jobs) and 'jobs'. Each job needs an 'output_dir' and one of 'aoi', 'bbox', or 'points' and takes the same
+    settings as landsatlinks search (see JOB_DEFAULTS). Relative paths are relative to the job file.
+    :return: list of job dicts, see parse_job
+    """
+    utils.validate_file_paths(fp, 'job', file=True, write=False)
+    try:
+        with open(fp) as f:
+            job_file = json.load(f)
+    except ValueError as e:
+        print(f'Error: could not read job file {fp}: {e}')
+        exit(1)
+    if isinstance(job_file, list):
+        job_file = {'jobs': job_file}
+    if not isinstance(job_file, dict) or not job_file.get('jobs'):
+        print(f'Error: no jobs found in {fp}. Expecting a list of jobs or an object with the key "jobs".')
+        exit(1)
+
+    defaults = {**JOB_DEFAULTS, **job_file.get('defaults', {})}
+    base_dir = os.path.dirname(os.path.realpath(fp))
+    jobs = [parse_job({**defaults, **config}, n, base_dir) for n, config in enumerate(job_file['jobs'], 1)]
+    # same checks as landsatlinks search --download, before any API requests are sent
+    if any(job['download'] for job in jobs):
+        utils.check_os()
+        utils.check_dependencies(['aria2c'])
+    return jobs
+
+
+def parse_job(config: dict, n: int, base_dir: str) -> dict:
+    """
+    Validate the settings of a single job and load its tile list.
+    :param n: number of the job, used as name if the job has no name
+    :param base_dir: directory relative paths are resolved against
+    :return: job dict
+    """
+    name = config['name'] or f'job {n}'
+    unknown = sorted(set(config) - set(JOB_DEFAULTS))
+    if unknown:
+        print(f'Error: {name}: unknown setting(s) {", ".join(unknown)}. Valid settings: {", ".join(JOB_DEFAULTS)}')
+        exit(1)
+    if not config['output_dir']:
+        print(f'Error: {name}: "output_dir" is required.')
+        exit(1)
+    if bool(config['aoi']) + bool(config['bbox']) + bool(config['points']) != 1:
+        print(f'Error: {name}: exactly one of "aoi", "bbox", or "points" is required.')
+        exit(1)
+
+    def path(key):
+        return os.path.realpath(os.path.join(base_dir, config[key])) if config[key] else None
+
+    def values(key, n=None):
+        """Comma-separated string or JSON list of values as list of strings."""
+        value = config[key]
+        items = [str(item) for item in value] if isinstance(value, (list, tuple)) else str(value).split(',')
+        items = [item.strip() for item in items]
+        if n is not None and len(items) != n:
+            print(f'Error: {name}: "{key}" needs {n} values, received {value}.')
+            exit(1)
+        return items
+
+    output_dir = path('output_dir')
+    utils.validate_file_paths(output_dir, 'downloads', file=False, write=True)
+    if config['forcelogs']:
+        utils.validate_file_paths(path('forcelogs'), 'FORCE log', file=False, write=False)
+    for key, file_type in (('queue_file', 'queue'), ('url_file', 'url')):
+        if not config[key]:
+            continue
+        if os.path.isfile(path(key)):
+            utils.validate_file_paths(path(key), file_type, file=True, write=True)
+        else:
+            utils.validate_file_paths(os.path.dirname(path(key)), file_type, file=False, write=True)
+
+    sensors = values('sensor')
+    if not all([sensor in DATASETS for sensor in sensors]):
+        print(f'Error: {name}: Invalid sensor name. Please use one of the following: TM/ETM/OLI.')
+        exit(1)
+
+    currentDate = date.today().strftime('%Y%m%d')
+    dates = values('daterange', 2) if config['daterange'] else ['19700101', currentDate]
+    utils.check_date_validity(dates, 'Start/End')
+    start, end = [datetime.strftime(datetime.strptime(d, '%Y%m%d'), '%Y-%m-%d') for d in dates]
+    ingest_dates = values('ingestrange', 2) if config['ingestrange'] else ['19700101', currentDate]
+    utils.check_date_validity(ingest_dates, 'Ingest')
+    ingest_filter = [datetime.strftime(datetime.strptime(d, '%Y%m%d'), '%Y-%m-%d') for d in ingest_dates]
+
+    minCC, maxCC = values('cloudcover', 2)
+    try:
+        validCC = all([-1 <= cc <= 100 for cc in [float(minCC), float(maxCC)]])
+    except ValueError:
+        validCC = False
+    if not validCC:
+        print(f'Error: {name}: Cloud cover values must be between -1 and 100.')
+        exit(1)
+    try:
+        months = sorted({int(month) for month in values('months')})
+    except ValueError:
+        months = [0]
+    if not all([1 <= month <= 12 for month in months]):
+        print(f'Error: {name}: Months must be between 1 and 12.')
+        exit(1)
+    if config['tier'] not in ['T1', 'T2'] or config['level'] not in ['L1TP', 'L1GT', 'L1GS']:
+        print(f'Error: {name}: Invalid tier or processing level. Valid tiers: T1, T2, valid levels: L1TP, L1GT, L1GS')
+        exit(1)
+    if config['level'] != 'L1TP' and config['tier'] == 'T1':
+        print(f'Error: {name}: Tier 1 selected with processing level L1GT or L1GS.')
+        exit(1)
+
+    return {
+        'name': name,
+        'tiles': aoi.Aoi(path('aoi'), bbox=config['bbox'], points=path('points')).get_footprints,
+        'output_dir': output_dir,
+        'sensor': ','.join(sensors),
+        'datasets': [DATASETS[sensor] for sensor in sensors],
+        'start': start,
+        'end': end,
+        'min_cc': minCC,
+        'max_cc': maxCC,
+        'months': months,
+        'ingest_filter': ingest_filter,
+        'level': config['level'],
+        'tier': config['tier'],
+        'forcelogs': path('forcelogs'),
+        'queue_file': path('queue_file'),
+        'url_file': path('url_file'),
+        'download': bool(config['download']),
+        'products': ProductCollection(),
+    }
+
+
+def plan_batch(jobs: list) -> list:
+    """
+    Merge the searches of all jobs into a deduplicated list of queries.
+    Jobs searching the same dataset with the same processing level, tier, cloud cover, months, and ingest date
+    filters are grouped. Within a group, overlapping date ranges are merged and each merged date range is searched
+    once for the union of the tiles of all jobs overlapping it.
+    :return: list of query dicts, each with the jobs its results are fanned out to
+    """
+    groups = {}
+    for job in jobs:
+        for dataset in job['datasets']:
+            key = (
+                dataset, job['level'], job['tier'], float(job['min_cc']), float(job['max_cc']),
+                tuple(job['months']), tuple(job['ingest_filter'])
+            )
+            groups.setdefault(key, []).append(job)
+
+    queries = []
+    for (dataset, *_), group_jobs in groups.items():
+        first = group_jobs[0]
+        for start, end in cache.merge_intervals([(job['start'], job['end']) for job in group_jobs]):
+            query_jobs = [job for job in group_jobs if job['start'] <= end and job['end'] >= start]
+            queries.append({
+                'dataset': dataset,
+                'level': first['level'], 'tier': first['tier'],
+                'min_cc': first['min_cc'], 'max_cc': first['max_cc'],
+                'months': first['months'], 'ingest_filter': first['ingest_filter'],
+                'start': start, 'end': end,
+                'tiles': sorted({tile for job in query_jobs for tile in job['tiles']}),
+                'jobs': query_jobs,
+            })
+    return queries
+
+
+def fan_out(products: ProductCollection, jobs: list) -> None:
+    """Add the products of a merged query to the jobs whose tiles and date range they match."""
+    for job in jobs:
+        tiles = set(job['tiles'])
+        start, end = job['start'].replace('-', ''), job['end'].replace('-', '')
+        job['products'].extend(
+            product for product in products if product.path_row in tiles and start <= product.acq_date <= end
+        )
+
+
+def run_batch(api, jobs: list, no_action: bool = False, scene_cache=None) -> None:
+    """
+    Search for all jobs with merged queries, skip products present in each job's output directory (or processed
+    according to its FORCE logs), and generate the download links of all jobs at once. Links are written to each
+    job's url file, or the products are downloaded to its output directory.
+    :param api: logged in eeapi.eeapi
+    :param scene_cache: optional cache.SceneCache
+    """
+    queries = plan_batch(jobs)
+    n_job_tiles = sum(len(job['tiles']) * len(job['datasets']) for job in jobs)
+    n_query_tiles = sum(len(query['tiles']) for query in queries)
+    print(f'\n{len(jobs)} jobs with {n_job_tiles} tile searches merged into {len(queries)} queries '
+          f'for {n_query_tiles} tiles.\n')
+
+    for query in queries:
+        with tracer.phase(f'search {query["dataset"]}', tiles=len(query['tiles'])) as span:
+            products = api.retrieve_search_results(
+                datasetName=query['dataset'], data_type_l1=query['level'], tier=query['tier'],
+                start=query['start'], end=query['end'], seasonalFilter=query['months'],
+                ingestFilter=query['ingest_filter'],
+                minCC=query['min_cc'], maxCC=query['max_cc'],
+                prList=query['tiles'], cache=scene_cache
+            )
+            span['items'] = len(products)
+        fan_out(products, query['jobs'])
+
+    # scan each directory only once, even if it is shared by several jobs
+    scanned = {}
+
+    def find_files(search_path, search_type):
+        if (search_path, search_type) not in scanned:
+            with tracer.phase(f'scan {search_type} files') as span:
+                scanned[(search_path, search_type)] = utils.find_files(
+                    search_path=search_path, search_type=search_type, recursive=True
+                )
+                span['items'] = len(scanned[(search_path, search_type)])
+        return scanned[(search_path, search_type)]
+
+    for job in jobs:
+        n_found = len(job['products'])
+        if job['forcelogs']:
+            job['products'] = job['products'].exclude(find_files(job['forcelogs'], 'log'))
+        job['products'] = job['products'].exclude(find_files(job['output_dir'], 'product'))
+        print(
+            f'{job["name"]}: {n_found} scenes found, {len(job["products"])} not downloaded or processed yet '
+            f'({utils.bytes_to_humanreadable(job["products"].total_size)})'
+        )
+
+    if no_action:
+        return
+
+    # generate the links of products requested by several jobs only once
+    pending = {}
+    for job in jobs:
+        for product in job['products']:
+            pending.setdefault(product.display_id, product)
+    if not pending:
+        print('Nothing left to download.')
+        return
+    with tracer.phase('download links', items=len(pending)):
+        urls = api.get_download_links(dl_product_ids=ProductCollection(pending.values()))
+    urlsById = {}
+    for url in urls:
+        match = re.search(utils.PRODUCT_ID_REGEX, url)
+        if match:
+            urlsById[match.group(0)] = url
+    if len(urlsById) < len(urls):
+        print(f'Warning: {len(urls) - len(urlsById)} download links could not be assigned to a product bundle.')
+
+    timeNow = datetime.now().strftime('%Y%m%dT%H%M%S')
+    for job in jobs:
+        job_urls = [urlsById[product.display_id] for product in job['products'] if product.display_id in urlsById]
+        if not job_urls:
+            continue
+        if job['download']:
+            print(f'\n{job["name"]}: downloading {len(job_urls)} product bundles to {job["output_dir"]}')
+            with tracer.phase('download', items=len(job_urls)):
+                download.download(urls=job_urls, output_dir=job['output_dir'], force_queue_fp=job['queue_file'])
+        else:
+            # jobs may share an output directory, so the job name is part of the file name
+            jobName = re.sub('[^A-Za-z0-9_-]+', '_', job['name'])
+            links_path = job['url_file'] or os.path.join(
+                job['output_dir'], f'urls_landsat_{job["sensor"].replace(",", "_")}_{jobName}_{timeNow}.txt'
+            )
+            print(f'{job["name"]}: writing {len(job_urls)} download links to {links_path}')
+            with open(links_path, 'w') as file:
+                file.write('\n'.join(job_urls))
@@ -0,0 +1,385 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+CACHE_DIR = os.environ.get(
+    'LANDSATLINKS_CACHE_DIR',
+    os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'landsatlinks')
+)
+# Scenes acquired within this many days before a search may still be added to the archive,
+# date ranges that recent are never considered fully cached.
+INGEST_LAG_DAYS = 30
+# M2M API keys expire two hours after login
+API_KEY_LIFETIME = 7200
+
+
+class SceneCache:
+    """
+    On-disk SQLite cache of scene-search and download-options metadata.
+    Scenes are keyed by dataset and entity ID and store path/row, acquisition date, processing level and tier.
+    For every dataset, path/row, processing level and tier the date ranges that have been searched completely
+    (i.e. without cloud cover or seasonal restrictions) are recorded, so only the gaps need to be requested.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_age_days: int = 30, max_scenes: int = 1000000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.fp = os.path.join(cache_dir, 'scenes.sqlite')
+        self.max_age_days = max_age_days
+        self.max_scenes = max_scenes
+        self.db = sqlite3.connect(self.fp)
+        self.db.executescript(
+            'CREATE TABLE IF NOT EXISTS scenes ('
+            '  dataset TEXT, entity_id TEXT, display_id TEXT, product_id TEXT,'
+            '  path_row TEXT, acq_date TEXT, level TEXT, tier TEXT,'
+            '  filesize INTEGER, cloud_cover REAL, cached_at REAL,'
+            '  PRIMARY KEY (dataset, entity_id));'
+            'CREATE INDEX IF NOT EXISTS scenes_lookup ON scenes (dataset, level, tier, path_row, acq_date);'
+            'CREATE TABLE IF NOT EXISTS coverage ('
+            '  dataset TEXT, level TEXT, tier TEXT, path_row TEXT, start TEXT, end TEXT, cached_at REAL);'
+            'CREATE INDEX IF NOT EXISTS coverage_lookup ON coverage (dataset, level, tier, path_row);'
+        )
+        # scene footprints were added later, older caches are extended
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(scenes)')]
+        if 'spatial_coverage' not in columns:
+            with self.db:
+                self.db.execute('ALTER TABLE scenes ADD COLUMN spatial_coverage TEXT')
+        self.evict()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def evict(self) -> None:
+        """
+        Remove entries older than max_age_days and the oldest scenes exceeding max_scenes.
+        The coverage of every tile that lost scenes is removed as well, its date ranges are not complete anymore.
+        """
+        oldest = time.time() - self.max_age_days * 86400
+        with self.db:
+            evicted = self.db.execute(
+                'SELECT rowid, dataset, level, tier, path_row FROM scenes WHERE cached_at < ?', (oldest,)
+            ).fetchall()
+            n_excess = self.db.execute('SELECT COUNT(*) FROM scenes').fetchone()[0] - len(evicted) - self.max_scenes
+            if n_excess > 0:
+                evicted += self.db.execute(
+                    'SELECT rowid, dataset, level, tier, path_row FROM scenes WHERE cached_at >= ? '
+                    'ORDER BY cached_at LIMIT ?', (oldest, n_excess)
+                ).fetchall()
+            self.db.executemany('DELETE FROM scenes WHERE rowid = ?', [(row[0],) for row in evicted])
+            self.db.executemany(
+                'DELETE FROM coverage WHERE dataset = ? AND level = ? AND tier = ? AND path_row = ?',
+                {row[1:] for row in evicted}
+            )
+            self.db.execute('DELETE FROM coverage WHERE cached_at < ?', (oldest,))
+
+    def invalidate(self, dataset: str = None) -> None:
+        """Remove all entries, or all entries of one dataset."""
+        with self.db:
+            if dataset:
+                self.db.execute('DELETE FROM scenes WHERE dataset = ?', (dataset,))
+                self.db.execute('DELETE FROM coverage WHERE dataset = ?', (dataset,))
+            else:
+                self.db.execute('DELETE FROM scenes')
+                self.db.execute('DELETE FROM coverage')
+        self.db.execute('VACUUM')
+
+    def info(self) -> dict:
+        n_scenes = self.db.execute('SELECT COUNT(*) FROM scenes').fetchone()[0]
+        n_tiles = self.db.execute('SELECT COUNT(DISTINCT path_row) FROM coverage').fetchone()[0]
+        return {'path': self.fp, 'scenes': n_scenes, 'tiles': n_tiles, 'size': os.path.getsize(self.fp)}
+
+    def find_gaps(self, dataset: str, level: str, tier: str, pr_list: list, start: str, end: str) -> dict:
+        """
+        Find the date ranges that are not cached yet for each tile.
+        :return: dict mapping (start, end) tuples (YYYY-MM-DD) to the list of tiles missing that date range
+        """
+        gaps = {}
+        for pr in pr_list:
+            covered = self.db.execute(
+                'SELECT start, end FROM coverage WHERE dataset = ? AND level = ? AND tier = ? AND path_row = ? '
+                'ORDER BY start',
+                (dataset, level, tier, pr)
+            ).fetchall()
+            for gap in subtract_intervals((start, end), covered):
+                gaps.setdefault(gap, []).append(pr)
+        return gaps
+
+    def add_scenes(self, dataset: str, scenes: list) -> None:
+        """
+        Store scene-search results.
+        :param scenes: list of scene dicts as returned by scene-search
+        """
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO scenes (dataset, entity_id, display_id, path_row, acq_date, level, tier, cloud_cover,'
+                '  spatial_coverage, cached_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (dataset, entity_id) DO UPDATE SET display_id = excluded.display_id,'
+                '  cloud_cover = excluded.cloud_cover, spatial_coverage = excluded.spatial_coverage,'
+                '  cached_at = excluded.cached_at',
+                [
+                    (
+                        dataset, scene['entityId'], scene['displayId'], scene['displayId'][10:16],
+                        acquisition_date(scene['displayId']), scene['displayId'][5:9], scene['displayId'][-2:],
+                        float(scene['cloudCover']) if scene.get('cloudCover') is not None else -1.0,
+                        json.dumps(scene['spatialCoverage']) if scene.get('spatialCoverage') else None, now
+                    )
+                    for scene in scenes
+                ]
+            )
+
+    def add_products(self, dataset: str, products: list) -> None:
+        """
+        Store download-options results.
+        :param products: products.ProductCollection as returned by eeapi.filter_product_bundles
+        """
+        with self.db:
+            self.db.executemany(
+                'UPDATE scenes SET product_id = ?, filesize = ? WHERE dataset = ? AND entity_id = ?',
+                [(p.product_id, p.filesize, dataset, p.entity_id) for p in products]
+            )
+
+    def add_coverage(self, dataset: str, level: str, tier: str, pr_list: list, start: str, end: str) -> None:
+        """
+        Record that a date range has been searched completely for the given tiles.
+        Recently acquired scenes may still be ingested later, so the range is cut off INGEST_LAG_DAYS before today.
+        """
+        cutoff = (datetime.now() - timedelta(days=INGEST_LAG_DAYS)).strftime('%Y-%m-%d')
+        end = min(end, cutoff)
+        if end < start:
+            return
+        now = time.time()
+        with self.db:
+            for pr in pr_list:
+                key = (dataset, level, tier, pr)
+                intervals = self.db.execute(
+                    'SELECT start, end, cached_at FROM coverage '
+                    'WHERE dataset = ? AND level = ? AND tier = ? AND path_row = ?', key
+                ).fetchall()
+                merged = merge_intervals([(s, e) for s, e, _ in intervals] + [(start, end)])
+                # a merged interval is only as fresh as its oldest part
+                cached_at = min([c for _, _, c in intervals] + [now])
+                self.db.execute(
+                    'DELETE FROM coverage WHERE dataset = ? AND level = ? AND tier = ? AND path_row = ?', key
+                )
+                self.db.executemany(
+                    'INSERT INTO coverage VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [key + (s, e, cached_at) for s, e in merged]
+                )
+
+    def get_scenes(self, dataset: str, level: str, tier: str, pr_list: list, start: str, end: str,
+                   months: list = None) -> list:
+        """
+        Look up cached scenes matching the search criteria.
+        Scenes are not filtered by cloud cover: the cached value is the cloud cover of the scene, while searches
+        filter by land cloud cover.
+        :return: list of dicts with entityId, displayId, productId (None if not known yet), filesize, and
+                 spatialCoverage (None if not known)
+        """
+        scenes = []
+        for pr in pr_list:
+            rows = self.db.execute(
+                'SELECT entity_id, display_id, product_id, filesize, acq_date, spatial_coverage FROM scenes '
+                'WHERE dataset = ? AND level = ? AND tier = ? AND path_row = ? AND acq_date BETWEEN ? AND ? '
+                'ORDER BY acq_date',
+                (dataset, level, tier, pr, start, end)
+            ).fetchall()
+            for entity_id, display_id, product_id, filesize, acq_date, spatial_coverage in rows:
+                if months and int(acq_date[5:7]) not in months:
+                    continue
+                scenes.append({
+                    'entityId': entity_id, 'displayId': display_id, 'productId': product_id, 'filesize': filesize,
+                    'spatialCoverage': json.loads(spatial_coverage) if spatial_coverage else None
+                })
+        return scenes
+
+
+class IngestWatermarks:
+    """
+    Latest ingest date seen per search configuration, used by search --incremental.
+    Stored in a separate SQLite file so that they are not affected by SceneCache eviction or invalidation.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.fp = os.path.join(cache_dir, 'watermarks.sqlite')
+        self.db = sqlite3.connect(self.fp)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS watermarks (key TEXT PRIMARY KEY, ingest_date TEXT, updated_at REAL)'
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+    @staticmethod
+    def create_key(**search_config) -> str:
+        """Hash of the search configuration, e.g. tiles, sensors, and filters."""
+        return hashlib.sha1(json.dumps(search_config, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> str:
+        row = self.db.execute('SELECT ingest_date FROM watermarks WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, ingest_date: str) -> None:
+        """Store the ingest date (YYYY-MM-DD), existing later watermarks are kept."""
+        current = self.get(key)
+        if current and current >= ingest_date:
+            return
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)', (key, ingest_date, time.time())
+            )
+
+
+class FootprintCache:
+    """
+    WRS-2 tiles (PRFIDs) intersecting vector AOIs, so that repeated runs with the same AOI skip the intersection.
+    Entries are keyed by a hash of the AOI file contents (including shapefile sidecar files) and the version of the
+    WRS-2 grid, so changing either of them invalidates the entry.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.fp = os.path.join(cache_dir, 'footprints.sqlite')
+        self.db = sqlite3.connect(self.fp)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS footprints (key TEXT PRIMARY KEY, pr_list TEXT, cached_at REAL)'
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+    @staticmethod
+    def create_key(aoi_fp: str, wrs2_fp: str) -> str:
+        """Hash of the contents of the AOI file(s) and size/modification time of the WRS-2 grid."""
+        digest = hashlib.sha256()
+        stem, ext = os.path.splitext(aoi_fp)
+        files = [aoi_fp]
+        if ext.lower() == '.shp':
+            files += [stem + sidecar for sidecar in ('.shx', '.dbf', '.prj', '.cpg') if os.path.isfile(stem + sidecar)]
+        for fp in files:
+            digest.update(os.path.basename(fp).encode('utf-8'))
+            with open(fp, 'rb') as f:
+                for chunk in iter(lambda: f.read(1048576), b''):
+                    digest.update(chunk)
+        wrs2_stat = os.stat(wrs2_fp)
+        digest.update(f'{os.path.basename(wrs2_fp)}:{wrs2_stat.st_size}:{wrs2_stat.st_mtime_ns}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> list:
+        row = self.db.execute('SELECT pr_list FROM footprints WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, pr_list: list) -> None:
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO footprints VALUES (?, ?, ?)', (key, json.dumps(sorted(pr_list)), time.time())
+            )
+
+    def invalidate(self) -> None:
+        with self.db:
+            self.db.execute('DELETE FROM footprints')
+
+
+class ApiKeyCache:
+    """
+    M2M API keys of previous logins and their expiry, so that consecutive runs can skip the login roundtrip.
+    Keys are stored per endpoint and user in a JSON file that only the current user can read and write (0600).
+    The cache is ignored if the file is accessible by others.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, lifetime: float = API_KEY_LIFETIME, margin: float = 600):
+        """
+        :param lifetime: seconds an API key is valid after login
+        :param margin: cached keys expiring within this many seconds are not used anymore
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.fp = os.path.join(cache_dir, 'api_keys.json')
+        self.lifetime = lifetime
+        self.margin = margin
+
+    @staticmethod
+    def create_key(endpoint: str, user: str) -> str:
+        return hashlib.sha256(f'{endpoint}\n{user}'.encode('utf-8')).hexdigest()
+
+    def load(self) -> dict:
+        if not os.path.isfile(self.fp):
+            return {}
+        if os.stat(self.fp).st_mode & 0o077:
+            print(f'Warning: {self.fp} is accessible by other users, not using cached API keys.')
+            return {}
+        try:
+            with open(self.fp) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, keys: dict) -> None:
+        """Write atomically, the file is created with permissions 0600."""
+        now = time.time()
+        keys = {key: entry for key, entry in keys.items() if entry['expires'] > now}
+        tmp_fp = f'{self.fp}.{os.getpid()}.tmp'
+        fd = os.open(tmp_fp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(keys, f)
+        os.replace(tmp_fp, self.fp)
+
+    def get(self, endpoint: str, user: str) -> str:
+        """:return: cached API key that is valid for at least margin seconds, or None"""
+        entry = self.load().get(self.create_key(endpoint, user))
+        if entry and entry['expires'] - self.margin > time.time():
+            return entry['api_key']
+        return None
+
+    def set(self, endpoint: str, user: str, api_key: str) -> None:
+        keys = self.load()
+        keys[self.create_key(endpoint, user)] = {'api_key': api_key, 'expires': time.time() + self.lifetime}
+        self.save(keys)
+
+    def invalidate(self, endpoint: str, user: str) -> None:
+        keys = self.load()
+        if keys.pop(self.create_key(endpoint, user), None) is not None:
+            self.save(keys)
+
+
+def acquisition_date(display_id: str) -> str:
+    """Acquisition date (YYYY-MM-DD) from a Landsat product identifier."""
+    return f'{display_id[17:21]}-{display_id[21:23]}-{display_id[23:25]}'
+
+
+def merge_intervals(intervals: list) -> list:
+    """Merge overlapping or adjacent (start, end) date intervals (YYYY-MM-DD, inclusive)."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= next_day(merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(interval: tuple, covered: list) -> list:
+    """Parts of a (start, end) date interval (YYYY-MM-DD, inclusive) not covered by any of the covered intervals."""
+    start, end = interval
+    gaps = []
+    for c_start, c_end in merge_intervals(covered):
+        if c_end < start or c_start > end:
+            continue
+        if c_start > start:
+            gaps.append((start, previous_day(c_start)))
+        start = max(start, next_day(c_end))
+        if start > end:
+            break
+    if start <= end:
+        gaps.append((start, end))
+    return gaps
+
+
+def next_day(date: str) -> str:
+    return (datetime.strptime(date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def previous_day(date: str) -> str:
+    return (datetime.strptime(date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
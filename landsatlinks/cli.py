@@ -3,9 +3,12 @@ import signal
 from datetime import datetime
 from getpass import getpass
 
-from landsatlinks import download, utils, aoi
-from landsatlinks.eeapi import eeapi
+from landsatlinks import download, utils, aoi, batch, cache
+from landsatlinks.errors import M2MApiError
+from landsatlinks.retry import RetryPolicy
 from landsatlinks.parseargs import parse_cli_arguments
+from landsatlinks.products import ProductCollection
+from landsatlinks.trace import tracer
 
 
 def handler(signum, frame):
@@ -16,7 +19,65 @@ def handler(signum, frame):
 signal.signal(signal.SIGINT, handler)
 
 
+def update_watermark(watermarks, key: str, api) -> None:
+    """Store the latest ingest date seen in this run for --incremental runs."""
+    if watermarks is not None and api.latest_ingest_date:
+        watermarks.set(key, api.latest_ingest_date)
+        watermarks.close()
+
+
+def create_api(args):
+    """
+    Log in to the M2M API with the credentials from the secrets file, or ask for them.
+    :return: eeapi.eeapi
+    """
+    # imported here to keep startup fast for runs that don't access the API (e.g. landsatlinks download)
+    from landsatlinks.eeapi import eeapi
+
+    if args.secret:
+        secret = utils.load_secret(os.path.realpath(args.secret))
+        if len(secret) == 3:
+            use_login_token = True
+            del secret[0]
+        else:
+            use_login_token = False
+        user, passwd = secret
+    else:
+        print('\n')
+        user = input('Enter your USGS EarthExplorer username: ')
+        passwd = getpass('Enter your USGS EarthExplorer password: ')
+        use_login_token = False
+    with tracer.phase('login'):
+        return eeapi(
+            user, passwd, use_login_token,
+            n_workers=args.api_workers, retry_policy=RetryPolicy(max_retries=args.retries),
+            stream_responses=args.low_memory,
+            key_cache=cache.ApiKeyCache() if args.cache_login else None
+        )
+
+
+def configure_tracer(args, output_dir: str) -> None:
+    """Record timed spans of the phases and API calls of this run if --trace or --profile is set."""
+    if args.trace or args.profile:
+        if args.trace:
+            utils.validate_file_paths(os.path.dirname(os.path.realpath(args.trace)), 'trace', file=False, write=True)
+        tracer.configure(
+            fp=args.trace or os.path.join(output_dir, f'trace_{datetime.now().strftime("%Y%m%dT%H%M%S")}.json'),
+            profile_dir=args.profile
+        )
+
+
 def main():
+    try:
+        run()
+    except M2MApiError as e:
+        print(f'Error: {e}')
+        exit(1)
+    finally:
+        tracer.write()
+
+
+def run():
     # ==================================================================================================================
     # 1. Check input and set up variables
     args = parse_cli_arguments()
@@ -25,10 +86,46 @@ def main():
         print(f'No arguments provided, run "{utils.PROG_NAME} --help" for more information')
         exit(1)
 
+    sat_dict = {'TM': 'landsat_tm_c2_l1', 'ETM': 'landsat_etm_c2_l1', 'OLI': 'landsat_ot_c2_l1'}
+
+    # manage the scene metadata cache and exit
+    if 'cache_action' in args:
+        sceneCache = cache.SceneCache()
+        if args.cache_action == 'invalidate':
+            sceneCache.invalidate(dataset=sat_dict[args.sensor] if args.sensor else None)
+            if not args.sensor:
+                footprintCache = cache.FootprintCache()
+                footprintCache.invalidate()
+                footprintCache.close()
+            print(f'Scene cache invalidated: {sceneCache.fp}')
+        info = sceneCache.info()
+        print(
+            f'Scene cache: {info["path"]}\n'
+            f'{info["scenes"]} scenes for {info["tiles"]} tiles cached, '
+            f'{utils.bytes_to_humanreadable(info["size"])} on disk'
+        )
+        sceneCache.close()
+        exit(0)
+
+    # run many search jobs from a job file with merged queries
+    if 'job_file' in args:
+        jobs = batch.load_jobs(args.job_file)
+        configure_tracer(args, os.path.dirname(os.path.realpath(args.job_file)))
+        api = create_api(args)
+        sceneCache = cache.SceneCache() if args.cache else None
+        batch.run_batch(api, jobs, no_action=args.no_action, scene_cache=sceneCache)
+        if sceneCache:
+            sceneCache.close()
+        api.logout()
+        exit(0)
+
     # validate output directory
     output_dir = os.path.realpath(args.output_dir)
     utils.validate_file_paths(output_dir, 'downloads', file=False, write=True)
 
+    # record timed spans of the phases and API calls of this run
+    configure_tracer(args, output_dir)
+
     # validate FORCE queue file path
     queue_path = args.queue_file
     if queue_path:
@@ -43,7 +140,8 @@ def main():
         utils.check_os()
         utils.check_dependencies(['aria2c'])
         utils.validate_file_paths(args.url_file, 'url file', file=True, write=False)
-        download.download_standalone(links_fp=args.url_file, output_dir=args.output_dir, queue_fp=queue_path)
+        with tracer.phase('download'):
+            download.download_standalone(links_fp=args.url_file, output_dir=args.output_dir, queue_fp=queue_path)
         exit(0)
 
     # Check platform and dependencies in case the -n/--no-download flag is not set
@@ -52,7 +150,32 @@ def main():
         utils.check_dependencies(['aria2c'])
 
     # load pathrow list
-    prList = aoi.Aoi(args.aoi).get_footprints
+    if bool(args.aoi) + bool(args.bbox) + bool(args.points) != 1:
+        print('Error: Please provide exactly one AOI: an AOI file, --bbox, or --points.')
+        exit(1)
+    with tracer.phase('aoi') as span:
+        aoiInput = aoi.Aoi(args.aoi, bbox=args.bbox, points=args.points)
+        prList = aoiInput.get_footprints
+        span['items'] = len(prList)
+        # optional spatial filter
+        spatialFilter = None
+        if args.spatial_filter:
+            if aoiInput.type == 'txt':
+                print('Warning: --spatial-filter requires a vector, bounding box, or point AOI, '
+                      'ignoring it for tile lists.')
+            else:
+                spatialFilter = aoiInput.spatial_filter(mode=args.spatial_filter)
+        # optional filter by the overlap of scene footprints and the AOI
+        coverageFilter = None
+        if args.min_overlap is not None:
+            if not 0 <= args.min_overlap <= 1:
+                print('Error: --min-overlap must be between 0 and 1.')
+                exit(1)
+            if aoiInput.type == 'txt':
+                print('Warning: --min-overlap requires a vector, bounding box, or point AOI, '
+                      'ignoring it for tile lists.')
+            else:
+                coverageFilter = aoiInput.coverage_filter(args.min_overlap)
 
     # dataset name
     if not all([sensor in ['TM', 'ETM', 'OLI'] for sensor in args.sensor.split(',')]):
@@ -60,7 +183,6 @@ def main():
               'A comma-separated combination of sensor names is also possible (e.g. ETM,OLI)\n'
               'Exiting.')
         exit(1)
-    sat_dict = {'TM': 'landsat_tm_c2_l1', 'ETM': 'landsat_etm_c2_l1', 'OLI': 'landsat_ot_c2_l1'}
     datasetNames = [sat_dict[sensor] for sensor in args.sensor.split(',')]
 
     # validate dates and set range
@@ -92,6 +214,24 @@ def main():
               'Choose Tier 2 (T2) or Real-Time (RT) for processing levels lower than L1TP.')
         exit(1)
 
+    # narrow the ingestion time filter to scenes added since the last run
+    watermarks, watermarkKey = None, None
+    if args.incremental:
+        watermarks = cache.IngestWatermarks()
+        watermarkKey = watermarks.create_key(
+            tiles=prList, sensors=sorted(datasetNames), level=dataTypeL1, tier=tier,
+            dates=[start, end], cloudcover=[minCC, maxCC], months=seasonalFilter,
+            spatial_filter=args.spatial_filter,
+            # only part of the key if set, so keys of earlier runs stay valid
+            **({'min_overlap': args.min_overlap} if coverageFilter else {})
+        )
+        lastIngestDate = watermarks.get(watermarkKey)
+        if lastIngestDate:
+            ingest_filter[0] = max(ingest_filter[0], lastIngestDate)
+            print(f'Incremental search: only scenes ingested since {ingest_filter[0]} are considered.')
+        else:
+            print('Incremental search: no previous run found, searching the full ingestion time range.')
+
     # validate FORCE Level-2 log path
     if args.forcelogs:
         log_path = args.forcelogs
@@ -100,20 +240,7 @@ def main():
     # ==================================================================================================================
     # 2. Run
     # Login
-    if args.secret:
-        secret = utils.load_secret(os.path.realpath(args.secret))
-        if len(secret) == 3:
-            use_login_token = True
-            del secret[0]
-        else:
-            use_login_token = False
-        user, passwd = secret
-    else:
-        print('\n')
-        user = input('Enter your USGS EarthExplorer username: ')
-        passwd = getpass('Enter your USGS EarthExplorer password: ')
-        use_login_token = False
-    api = eeapi(user, passwd, use_login_token)
+    api = create_api(args)
 
     print(
         f'\nSensor(s): {args.sensor.replace(",", ", ")}\n'
@@ -123,23 +250,29 @@ def main():
         f'Cloud cover: {minCC}% to {maxCC}%\n'
     )
 
+    sceneCache = cache.SceneCache() if args.cache else None
+
     # Get product IDs of products that match the search criteria
-    dlProductIds = []
+    dlProductIds = ProductCollection()
     for datasetName in datasetNames:
-        dlProductIds.extend(
-            api.retrieve_search_results(
+        with tracer.phase(f'search {datasetName}') as span:
+            products = api.retrieve_search_results(
                 datasetName=datasetName, data_type_l1=dataTypeL1, tier=tier,
                 start=start, end=end, seasonalFilter=seasonalFilter,
                 ingestFilter=ingest_filter,
                 minCC=minCC, maxCC=maxCC,
-                prList=prList
+                prList=prList, spatialFilter=spatialFilter, cache=sceneCache,
+                coverageFilter=coverageFilter
             )
-        )
+            span['items'] = len(products)
+        dlProductIds.extend(products)
+    if sceneCache:
+        sceneCache.close()
     if not dlProductIds:
         print('No scenes matching search results found. Exiting.')
         exit(0)
 
-    total_size = utils.bytes_to_humanreadable(sum([s.get('filesize') for s in dlProductIds]))
+    total_size = utils.bytes_to_humanreadable(dlProductIds.total_size)
     print(
         f'{len(dlProductIds)} Landsat Level 1 scenes matching criteria found\n'
         f'{total_size} data volume found'
@@ -148,51 +281,62 @@ def main():
     # Check for FORCE Level-2 log files in the filesystem
     if args.forcelogs:
         print('\nChecking file system for FORCE Level-2 processing log files.')
-        product_ids_logs = utils.find_files(search_path=log_path, search_type='log', recursive=True)
+        with tracer.phase('scan FORCE logs') as span:
+            product_ids_logs = utils.find_files(search_path=log_path, search_type='log', recursive=True)
+            span['items'] = len(product_ids_logs)
         if len(product_ids_logs) == 0:
             print(f'No FORCE logs found at {log_path}')
         else:
-            dlProductIds = [productid for productid in dlProductIds if productid['displayId'] not in product_ids_logs]
+            dlProductIds = dlProductIds.exclude(product_ids_logs)
             if len(dlProductIds) == 0:
                 print(f'{len(product_ids_logs)} FORCE log files found, '
                       f'all product bundles from search already processed.\nExiting.')
+                update_watermark(watermarks, watermarkKey, api)
                 exit(0)
             print(
                 f'{len(product_ids_logs)} FORCE log files found, '
                 f'{len(dlProductIds)} products from search results not processed by FORCE yet.\n'
-                f'Remaining download size: {utils.bytes_to_humanreadable(sum([s.get("filesize") for s in dlProductIds]))}'
+                f'Remaining download size: {utils.bytes_to_humanreadable(dlProductIds.total_size)}'
             )
 
     # Check for existing product bundles in filesystem
-    product_ids_filesystem = utils.find_files(search_path=output_dir, search_type='product', recursive=True)
+    with tracer.phase('scan output directory') as span:
+        product_ids_filesystem = utils.find_files(search_path=output_dir, search_type='product', recursive=True)
+        span['items'] = len(product_ids_filesystem)
     if product_ids_filesystem:
-        dlProductIds = [productid for productid in dlProductIds if productid['displayId'] not in product_ids_filesystem]
+        dlProductIds = dlProductIds.exclude(product_ids_filesystem)
         if len(dlProductIds) == 0:
             print(f'{len(product_ids_filesystem)} product bundles found in output directory, '
                   f'nothing left to download.\nExiting.')
+            update_watermark(watermarks, watermarkKey, api)
             exit(0)
         else:
             print(
                 f'{len(product_ids_filesystem)} product bundles found in output directory, '
                 f'{len(dlProductIds)} not downloaded yet.\n'
-                f'Remaining download size: {utils.bytes_to_humanreadable(sum([s.get("filesize") for s in dlProductIds]))}'
+                f'Remaining download size: {utils.bytes_to_humanreadable(dlProductIds.total_size)}'
             )
 
     if args.no_action:
         exit(0)
 
-    # Generate download links
-    urls = api.get_download_links(dl_product_ids=dlProductIds)
-    api.logout()
-
-    # Download product bundles
+    # Generate download links and download product bundles. Links are handed to the download workers as soon as
+    # they are generated, so link generation for later chunks overlaps with downloading.
     if args.download:
-        download.download(urls=urls, output_dir=output_dir, force_queue_fp=queue_path)
+        with tracer.phase('download links and download', items=len(dlProductIds)):
+            urls = api.iter_download_links(dl_product_ids=dlProductIds)
+            download.download(urls=urls, output_dir=output_dir, force_queue_fp=queue_path, n_urls=len(dlProductIds))
+        api.logout()
         print('Download complete')
+        update_watermark(watermarks, watermarkKey, api)
         exit(0)
 
     # or just save download urls to disk
     else:
+        with tracer.phase('download links') as span:
+            urls = api.get_download_links(dl_product_ids=dlProductIds)
+            span['items'] = len(urls)
+        api.logout()
         timeNow = datetime.now().strftime('%Y%m%dT%H%M%S')
         links_path = os.path.join(
             output_dir,
@@ -201,3 +345,4 @@ def main():
         print(f'Writing download links to {links_path}\n')
         with open(links_path, 'w') as file:
             file.write("\n".join(urls))
+        update_watermark(watermarks, watermarkKey, api)
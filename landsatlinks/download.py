@@ -1,13 +1,16 @@
 import json
-import multiprocessing
-import multiprocessing as mp
 import os
 import re
 import signal
-
-from tqdm import tqdm
+import time
+from typing import TYPE_CHECKING
 
 from landsatlinks import utils
+from landsatlinks.trace import tracer
+
+if TYPE_CHECKING:
+    # only for annotations, multiprocessing is imported when downloading to keep startup fast
+    import multiprocessing
 
 
 def load_links(filepath: str) -> list:
@@ -53,7 +56,7 @@ def create_force_queue(url: str, output_dir: str, queue_fp: str) -> None:
             f.write(f'{scene_path} QUEUED\n')
 
 
-def download_worker(url: str, output_dir: str, mp_queue: multiprocessing.Queue) -> None:
+def download_worker(url: str, output_dir: str, mp_queue: 'multiprocessing.Queue') -> tuple:
     import subprocess
     import re
     PRODUCT_ID_REGEX = re.compile('(L[CET]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_T1|T2|RT)')
@@ -69,14 +72,15 @@ def download_worker(url: str, output_dir: str, mp_queue: multiprocessing.Queue)
         '--continue',
         url
     ]
+    start = time.time()
     result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
     product_id = re.search(PRODUCT_ID_REGEX, result.stdout).group(0)
     mp_queue.put(product_id)
 
-    return url
+    return url, product_id, start, time.time() - start
 
 
-def dl_listener_for_force_queue(output_dir: str, queue_fp: str, mp_queue: multiprocessing.Queue) -> None:
+def dl_listener_for_force_queue(output_dir: str, queue_fp: str, mp_queue: 'multiprocessing.Queue') -> None:
     """Listens to urls on the multiprocessing queue and runs create_force_queue"""
 
     if queue_fp:
@@ -99,16 +103,28 @@ def dl_listener_for_force_queue(output_dir: str, queue_fp: str, mp_queue: multip
                 break
 
 
-def download(urls: list, output_dir: str, n_tasks: int = 4, force_queue_fp: str = None) -> None:
+def download(urls, output_dir: str, n_tasks: int = 4, force_queue_fp: str = None, n_urls: int = None) -> None:
+    """
+    Download product bundles using aria2c.
+    :param urls: list or iterable of urls. Urls are handed to the download workers as soon as the iterable yields
+                 them, so a generator (e.g. eeapi.iter_download_links) overlaps link generation and downloading.
+    :param n_urls: number of urls for the progress bar, required if urls is not a list
+    """
+    # imported here, only needed when downloading
+    import multiprocessing as mp
+    from tqdm import tqdm
+
     manager = mp.Manager()
     mp_queue = manager.Queue()
     pool = mp.Pool(n_tasks)
     # set up watcher to listen for new results that can be added to the force_queue
     watcher = pool.apply_async(dl_listener_for_force_queue, (output_dir, force_queue_fp, mp_queue))
 
-    progress_bar = tqdm(total=len(urls), desc=f'Downloading', unit='product bundle', ascii=' >=')
+    progress_bar = tqdm(total=n_urls if n_urls is not None else len(urls), desc=f'Downloading', unit='product bundle', ascii=' >=')
 
-    def callback(url):
+    def callback(result):
+        url, product_id, start, duration = result
+        tracer.add('aria2c', start, duration, 'download', product_id=product_id)
         progress_bar.update()
 
     # set up jobs
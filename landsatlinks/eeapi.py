@@ -1,92 +1,98 @@
 import json
-import sys
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 
 import requests
+from requests.adapters import HTTPAdapter
 
 import landsatlinks.utils as utils
+from landsatlinks import planner, ratelimit, trace
+from landsatlinks.errors import M2MApiError
+from landsatlinks.jsonstream import StreamingJsonParser
+from landsatlinks.products import ProductBundle, ProductCollection
+from landsatlinks.retry import CircuitBreaker, RetryPolicy
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class eeapi(object):
 
-    def __init__(self, user: str, password: str, use_login_token: bool = True):
-        self.endpoint = 'https://m2m.cr.usgs.gov/api/api/json/stable/'
-        self.key = self.login(user, password, use_login_token)
+def json_dumps(obj) -> bytes:
+    """Serialize obj to JSON bytes, using orjson if available."""
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
 
-    def login(self, user: str, password: str, use_login_token: bool = True) -> str:
+
+def json_loads(data):
+    """Deserialize JSON from bytes or str, using orjson if available."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+ENDPOINT = 'https://m2m.cr.usgs.gov/api/api/json/stable/'
+
+# scene-search and download-options fields kept when responses are streamed
+SCENE_FIELDS = ('entityId', 'displayId', 'cloudCover', 'publishDate', 'spatialCoverage')
+DOWNLOAD_OPTION_FIELDS = ('entityId', 'id', 'displayId', 'filesize', 'productName', 'available')
+STREAM_CHUNK_SIZE = 65536
+# (connect, read) timeout in seconds, the read timeout applies to the time between bytes received
+REQUEST_TIMEOUT = (30, 300)
+
+# endpoints that can safely be requested again after a transient error
+RETRY_ENDPOINTS = ('login', 'login-token', 'scene-search', 'download-options', 'download-retrieve')
+# error codes of invalid or expired API keys, requests are repeated once after logging in again
+AUTH_ERRORS = ('AUTH_INVALID', 'AUTH_KEY_INVALID', 'AUTH_EXPIRED')
+
+
+def compact_scene(scene: dict) -> dict:
+    return {field: scene.get(field) for field in SCENE_FIELDS}
+
+
+def compact_download_option(product: dict):
+    """Keep product bundles only, see eeapi.filter_product_bundles."""
+    if product.get('productName') != 'Landsat Collection 2 Level-1 Product Bundle':
+        return None
+    return {field: product.get(field) for field in DOWNLOAD_OPTION_FIELDS}
+
+
+class M2MFilters(object):
+    """
+    Building of M2M API search parameters and filtering of responses, shared by the synchronous eeapi and the
+    asynchronous aioeeapi.aioeeapi clients.
+    """
+
+    @staticmethod
+    def create_login_params(user: str, password: str, use_login_token: bool = True) -> tuple:
+        """
+        :return: login endpoint and JSON encoded login data
+        """
         if use_login_token:
             login_endpoint = 'login-token'
-            loginData = json.dumps({'username': user, 'token': password, 'catalogID': 'EE'})
+            loginData = json_dumps({'username': user, 'token': password, 'catalogID': 'EE'})
         else:
             login_endpoint = 'login'
-            loginData = json.dumps({'username': user, 'password': password, 'catalogID': 'EE'})
+            loginData = json_dumps({'username': user, 'password': password, 'catalogID': 'EE'})
             print(
                 'Warning: the endpoint for user/password login will be deprecated by the USGS M2M API in February 2025.\n'
                 'Please create a login token, info here: https://www.usgs.gov/media/files/m2m-application-token-documentation'
             )
+        return login_endpoint, loginData
 
-        with requests.post(f'{self.endpoint}{login_endpoint}?', data=loginData) as r:
-            response = r.json()
-            if response.get('errorCode', None):
-                print(f'Error: {response["errorCode"]}: {response["errorMessage"]}\n'
-                      'Please check your login data.\n'
-                      'Login will fail if you did not request access to the M2M API yet.\n'
-                      'Request access through your user profile at https://ers.cr.usgs.gov/')
-                exit(1)
-            return response['data']
-
-    def logout(self) -> None:
-        self.request('logout')
-
-    def request(self, request_code: str, **kwargs) -> dict:
-        """
-        Send a request to the machine2machine API.
-        :type request_code: string
-        :param request_code: Indicating method to API. List of codes: https://m2m.cr.usgs.gov/api/docs/reference/
-        :type kwargs: dict
-        :param kwargs: parameterization of the API request.
-        :return: API response as dict
-        """
-        url = f'{self.endpoint}{request_code}'
-        params = json.dumps(kwargs)
-        headers = {'X-Auth-Token': self.key}
-        with requests.post(url, params, headers=headers) as r:
-            response = r.json()
-            if response.get('errorCode', None):
-                if response['errorCode'] == 'RATE_LIMIT_USER_DL':
-                    print('Rate limit exceeded. Will sleep for 15 minutes.')
-                    utils.countdown(905)
-                    with requests.post(url, params, headers=headers) as rr:
-                        rresponse = rr.json()
-                        if rresponse.get('errorCode', None):
-                            print(f'Error: {rresponse["errorCode"]}: {rresponse["errorMessage"]}')
-                            print('M2M API threw an error despite waiting.\n'
-                                  'Please open an issue on github if the error persists.')
-                            sys.exit(1)
-                        return rresponse['data']
-                else:
-                    print(f'Error: {response["errorCode"]}: {response["errorMessage"]}')
-                    sys.exit(1)
-            else:
-                return response['data']
-
-    def scene_search(self,
-                     start: str, end: str,
-                     dataset_name: str = None, entity_id=None,
-                     seasonal_filter: list = None, pr_list: list = None,
-                     ingest_filter: list = None,
-                     max_results: int = 50000, **kwargs):
+    def create_search_params(self,
+                             start: str, end: str,
+                             dataset_name: str = None, entity_id=None,
+                             seasonal_filter: list = None, pr_list: list = None,
+                             ingest_filter: list = None, spatial_filter: dict = None, **kwargs) -> dict:
         """
-        Search for scenes matching search criteria
-        :param start: Temporal filter: start date
-        :param end: Temporal filter: end date
-        :param dataset_name: Name of the dataset to be queried (e.g. 'landsat_ot_c2_l1')
-        :param entity_id: Entity ID to directly search for scenes
-                          (legacy identifier in the format 'LC81920272020347LGN00')
-        :param seasonal_filter: Temporal filter: months to be included (list of int)
-        :param pr_list: Filter by path/row (list of int or str)
-        :param max_results: maximum number of results returned
-        :param kwargs: additional filters for the metadataFilter childFilters
-        :return: List containing one dict per scene
+        Build the parameters of a scene-search request. See scene_search for a description of the parameters.
+        :return: dict of scene-search parameters without paging information
         """
         if not dataset_name:
             print("No dataset defined. Use 'landsat_ot_c2_l1', 'landsat_etm_c2_l1', or 'landsat_tm_c2_l1'")
@@ -117,102 +123,35 @@ class eeapi(object):
             sceneFilter.update(
                 ingestFilter={'start': ingest_filter[0], 'end': ingest_filter[1]}
             )
+        if spatial_filter:
+            sceneFilter.update(spatialFilter=spatial_filter)
         searchParams = {
             'datasetName': dataset_name,
             'includeUnknownCloudCover': False,
-            'maxResults': max_results,
             'sceneFilter': sceneFilter
         }
         if entity_id:
             searchParams.update(entityId=entity_id)
 
-        response = self.request('scene-search', **searchParams)
-        if response.get('errorCode', None):
-            print(f'Error: {response["errorCode"]}: {response["errorMessage"]}')
-            sys.exit(1)
-        else:
-            return response['results']
+        return searchParams
 
-    def get_download_options(self, dataset_name, scene_ids):
+    @staticmethod
+    def filter_product_bundles(dl_options: list) -> ProductCollection:
         """
-        Retrieve download options, filter out the product bundles
-        :param dataset_name: Name of the dataset to be queried (e.g., 'landsat_ot_c2_l1')
-        :param scene_ids: List of entityIds (legacy scene identifiers, e.g., 'LC81920272020347LGN00')
-        :return: List of dictionaries containing entity id, product id, display id, and filesize for each
-                 collection 2 level-1 product bundle
+        Filter download options for available Collection 2 Level-1 product bundles
+        :param dl_options: download-options response items
+        :return: ProductCollection containing entity id, product id, display id, and filesize of each bundle
         """
-
-        sceneIdsSplit = [scene_ids[i:i + 5000] for i in range(0, len(scene_ids), 5000)]
-        dlOptions = []
-        for i, entity_ids in enumerate(sceneIdsSplit):
-            dl_options_params = {'datasetName': dataset_name, 'entityIds': entity_ids}
-            response = self.request('download-options', **dl_options_params)
-            dlOptions.extend(response)
-
-        dlProductIds = []
-        for product in dlOptions:
+        dlProductIds = ProductCollection()
+        for product in dl_options:
             # Make sure the product is available for this scene
             if product['productName'] == 'Landsat Collection 2 Level-1 Product Bundle':
                 if product['available'] is True:
-                    dlProductIds.append(
-                        {
-                            'entityId': product['entityId'],
-                            'productId': product['id'],
-                            'displayId': product['displayId'],
-                            'filesize': product['filesize']
-                        }
+                    dlProductIds.products.append(
+                        ProductBundle(product['entityId'], product['id'], product['displayId'], product['filesize'])
                     )
-
         return dlProductIds
 
-    def retrieve_search_results(
-            self, datasetName, data_type_l1, tier,
-            start, end, seasonalFilter, ingestFilter,
-            minCC, maxCC,
-            prList
-    ):
-        """
-        Combine scene_search and get_download_options, filter the results by allowed path/row, and get total size
-        :return: Dictionary containing scene IDs, legacy IDs, and filesize for each scene
-        """
-        sceneResponse = self.scene_search(
-            dataset_name=datasetName,
-            pr_list=prList,
-            start=start, end=end, seasonal_filter=seasonalFilter,
-            ingest_filter=ingestFilter,
-            min_cc=minCC, max_cc=maxCC,
-            data_type_l1=data_type_l1, tier=tier
-        )
-        filteredSceneResponse = utils.filter_results_by_pr(sceneResponse, prList)
-        if len(filteredSceneResponse) >= 15000:
-            print(f'Warning: The M2M API only allows requesting 15000 scenes/15 min. '
-                  f'{utils.PROG_NAME} will pause for 15 mins if rate limiting occurs.')
-        legacyIds = [s.get('entityId') for s in filteredSceneResponse]
-        dlProductIds = self.get_download_options(dataset_name=datasetName, scene_ids=legacyIds)
-
-        return dlProductIds
-
-    def get_download_links(self, dl_product_ids):
-        """
-        Retrieve download links for product bundles.
-        Requests are split into chunks of 1000 as large numbers have been leading to issues.
-        :param dl_product_ids: product ids (e.g., '5e81f14ff4f9941c') from get_download_options
-        :return: List of download urls
-        """
-
-        dlSplit = [dl_product_ids[i:i + 1000] for i in range(0, len(dl_product_ids), 1000)]
-        # Generate links
-        urls = []
-        for i, downloads in enumerate(dlSplit):
-            dl_request_params = {'downloads': downloads}
-            # Call the download request to get the download urls
-            response = self.request('download-request', **dl_request_params)
-            all_downloads = response['availableDownloads'] + response['preparingDownloads']
-            for download in all_downloads:
-                urls.append(download['url'])
-
-        return urls
-
     @staticmethod
     def create_meta_dict(filter_id: str, filter_type: str, **kwargs) -> dict:
         meta_dict = {'filterId': filter_id, 'filterType': filter_type}
@@ -305,3 +244,714 @@ class eeapi(object):
             )
 
         return filters
+
+
+class eeapi(M2MFilters):
+
+    def __init__(self, user: str, password: str, use_login_token: bool = True,
+                 pool_size: int = 10, n_workers: int = 4,
+                 retry_policy: RetryPolicy = None, circuit_breaker: CircuitBreaker = None,
+                 stream_responses: bool = False, endpoint: str = ENDPOINT,
+                 rate_limiter: ratelimit.SceneRateLimiter = None, tracer: trace.Tracer = None,
+                 key_cache=None, timeout: tuple = REQUEST_TIMEOUT):
+        self.endpoint = endpoint
+        # (connect, read) timeout in seconds of each request
+        self.timeout = timeout
+        self.n_workers = max(1, n_workers)
+        # parse scene-search and download-options responses incrementally, see stream_request
+        self.stream_responses = stream_responses
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.rate_limiter = rate_limiter or ratelimit.SceneRateLimiter()
+        # records a span per API call, disabled unless configured (see trace.Tracer)
+        self.tracer = tracer or trace.tracer
+        # latest publishDate (YYYY-MM-DD) of all scenes returned by retrieve_search_results
+        self.latest_ingest_date = None
+        self.session = self.create_session(max(pool_size, self.n_workers))
+        # credentials are kept to log in again if the API key expires
+        self.user = user
+        self.password = password
+        self.use_login_token = use_login_token
+        # optional cache.ApiKeyCache: a valid cached API key is used instead of logging in, new keys are added to
+        # the cache, and logout is skipped so that the key can be reused by the next run
+        self.key_cache = key_cache
+        self.key_lock = threading.Lock()
+        self.key = key_cache.get(endpoint, user) if key_cache is not None else None
+        if self.key is None:
+            self.key = self.login(user, password, use_login_token)
+
+    @staticmethod
+    def create_session(pool_size: int = 10) -> requests.Session:
+        """
+        Create a persistent, connection-pooled session so that consecutive API calls reuse the same TLS connection.
+        :param pool_size: number of connections kept alive in the pool
+        :return: requests.Session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'Content-Type': 'application/json'
+        })
+        return session
+
+    def login(self, user: str, password: str, use_login_token: bool = True) -> str:
+        login_endpoint, loginData = self.create_login_params(user, password, use_login_token)
+
+        try:
+            with self.tracer.span(login_endpoint) as span:
+                response = self.post(f'{self.endpoint}{login_endpoint}?', loginData, retry=True, span=span)
+        except M2MApiError as e:
+            print(f'Error: {e}')
+            exit(1)
+        if response.get('errorCode', None):
+            print(f'Error: {response["errorCode"]}: {response["errorMessage"]}\n'
+                  'Please check your login data.\n'
+                  'Login will fail if you did not request access to the M2M API yet.\n'
+                  'Request access through your user profile at https://ers.cr.usgs.gov/')
+            exit(1)
+        if self.key_cache is not None:
+            self.key_cache.set(self.endpoint, user, response['data'])
+        return response['data']
+
+    def refresh_key(self, expired_key: str) -> dict:
+        """
+        Log in again after the API rejected expired_key. Only the first of several threads seeing the same expired
+        key logs in, the others use the new key.
+        :return: request headers with the new API key
+        """
+        with self.key_lock:
+            if self.key == expired_key:
+                if self.key_cache is not None:
+                    self.key_cache.invalidate(self.endpoint, self.user)
+                self.key = self.login(self.user, self.password, self.use_login_token)
+            return {'X-Auth-Token': self.key}
+
+    def logout(self) -> None:
+        # keep cached API keys valid for the next run
+        if self.key_cache is None:
+            try:
+                self.request('logout')
+            except M2MApiError:
+                # the API key may already have expired, e.g. after downloading for a long time
+                pass
+        self.session.close()
+
+    def post(self, url: str, data: bytes, headers: dict = None, retry: bool = False, stream: bool = False,
+             span: dict = None):
+        """
+        Send a POST request and decode the JSON response.
+        Connection errors, timeouts (see REQUEST_TIMEOUT), incomplete or undecodable responses, HTTP 5xx/429
+        responses, and invalid JSON are considered transient. If retry is True, they are retried according to the
+        retry policy with exponential backoff and jitter.
+        :param stream: do not read the response body, return the open requests.Response instead (to be closed by
+                       the caller). Invalid JSON can't be retried in this case.
+        :param span: optional trace span attributes, updated with the number of retries and bytes received
+        While the circuit breaker is open, requests are paused until its trial request succeeded.
+        :raises M2MApiError: if the request failed and retries are exhausted, or the trial request of the circuit
+                             breaker failed
+        :return: decoded API response, or requests.Response if stream is True
+        """
+        attempt = 0
+        span = {} if span is None else span
+        while True:
+            span['retries'] = attempt
+            if not self.circuit_breaker.allow_request():
+                raise M2MApiError('CIRCUIT_OPEN', 'M2M API seems to be unavailable, too many failed requests.')
+            # the outcome is always recorded, otherwise a trial request would keep the circuit half-open
+            recorded = False
+            try:
+                r = self.session.post(url, data, headers=headers, stream=stream, timeout=self.timeout)
+                if r.status_code >= 500 or r.status_code == 429:
+                    r.close()
+                    raise M2MApiError(f'HTTP_{r.status_code}', r.reason)
+                if stream:
+                    response = r
+                else:
+                    with r:
+                        span['bytes'] = len(r.content)
+                        response = json_loads(r.content)
+                self.circuit_breaker.record_success()
+                recorded = True
+                return response
+            except (requests.RequestException, ValueError, M2MApiError) as e:
+                trialFailed = self.circuit_breaker.record_failure()
+                recorded = True
+                if isinstance(e, M2MApiError):
+                    error = e
+                else:
+                    error = M2MApiError(type(e).__name__, str(e))
+                if trialFailed:
+                    raise M2MApiError('CIRCUIT_OPEN', f'M2M API seems to be unavailable, too many failed requests. '
+                                                      f'Last error: {error}')
+                if not retry or attempt >= self.retry_policy.max_retries:
+                    raise error
+                delay = self.retry_policy.delay(attempt)
+                print(f'Warning: {error} - retrying in {round(delay, 1)} s '
+                      f'({attempt + 1}/{self.retry_policy.max_retries})')
+                time.sleep(delay)
+                attempt += 1
+            finally:
+                if not recorded:
+                    self.circuit_breaker.record_failure()
+
+    def request(self, request_code: str, **kwargs) -> dict:
+        """
+        Send a request to the machine2machine API.
+        Requests to idempotent endpoints (see RETRY_ENDPOINTS) are retried on transient errors.
+        :type request_code: string
+        :param request_code: Indicating method to API. List of codes: https://m2m.cr.usgs.gov/api/docs/reference/
+        :type kwargs: dict
+        :param kwargs: parameterization of the API request.
+        :raises M2MApiError: if the API returned an error or the request failed
+        :return: API response as dict
+        """
+        self.pace(request_code, kwargs)
+        url = f'{self.endpoint}{request_code}'
+        params = json_dumps(kwargs)
+        headers = {'X-Auth-Token': self.key}
+        retry = request_code in RETRY_ENDPOINTS
+        with self.tracer.span(request_code) as span:
+            response = self.post(url, params, headers=headers, retry=retry, span=span)
+            if response.get('errorCode', None) in AUTH_ERRORS and request_code != 'logout':
+                headers = self.refresh_key(headers['X-Auth-Token'])
+                response = self.post(url, params, headers=headers, retry=retry, span=span)
+            if response.get('errorCode', None):
+                if response['errorCode'] == 'RATE_LIMIT_USER_DL':
+                    print('Rate limit exceeded. Will sleep for 15 minutes.')
+                    self.wait_for_rate_limit()
+                    response = self.post(url, params, headers=headers, retry=retry, span=span)
+                    if response.get('errorCode', None):
+                        raise M2MApiError(
+                            response['errorCode'],
+                            f'{response["errorMessage"]}\nM2M API threw an error despite waiting.\n'
+                            'Please open an issue on github if the error persists.'
+                        )
+                else:
+                    raise M2MApiError(response['errorCode'], response['errorMessage'])
+            span['items'] = trace.count_items(response['data'])
+        return response['data']
+
+    def pace(self, request_code: str, params: dict) -> None:
+        """Pace scene-based requests to stay below the rate limit."""
+        if request_code == 'download-options':
+            n_scenes = len(params.get('entityIds', []))
+        elif request_code == 'download-request':
+            n_scenes = len(params.get('downloads', []))
+        else:
+            return
+        waited = self.rate_limiter.acquire(n_scenes)
+        if waited > 0:
+            self.tracer.add('rate-limit wait', time.time() - waited, waited, 'wait', items=n_scenes)
+
+    def wait_for_rate_limit(self) -> None:
+        """Wait 15 minutes after the API reported that the rate limit was exceeded."""
+        with self.tracer.span('rate-limit wait', 'wait'):
+            utils.countdown(905)
+
+    def stream_request(self, request_code: str, path: tuple, compact=None, response_info: dict = None, **kwargs):
+        """
+        Send a request to the machine2machine API and parse the array at path in the response item by item,
+        see jsonstream.StreamingJsonParser. Used for large responses to keep memory usage low.
+        :param request_code: Indicating method to API. List of codes: https://m2m.cr.usgs.gov/api/docs/reference/
+        :param path: object keys leading to the array in the response, e.g. ('data', 'results')
+        :param compact: optional function reducing each item to the fields needed, items mapped to None are dropped
+        :param response_info: optional dict, updated with the 'data' object of the response apart from the streamed
+                              array (e.g. totalHits) once all items have been yielded
+        :param kwargs: parameterization of the API request.
+        :raises M2MApiError: if the API returned an error or the request failed
+        :return: generator yielding (compacted) items
+        """
+        self.pace(request_code, kwargs)
+        url = f'{self.endpoint}{request_code}'
+        params = json_dumps(kwargs)
+        headers = {'X-Auth-Token': self.key}
+        retry = request_code in RETRY_ENDPOINTS
+        waited = False
+        refreshed = False
+        while True:
+            with self.tracer.span(request_code, streamed=True) as span:
+                r = self.post(url, params, headers=headers, retry=retry, stream=True, span=span)
+                with r:
+                    chunks = r.iter_content(STREAM_CHUNK_SIZE)
+                    if self.tracer.enabled:
+                        chunks = trace.count_bytes(chunks, span)
+                    parser = StreamingJsonParser(chunks, path, compact)
+                    span['items'] = 0
+                    try:
+                        for item in parser.items():
+                            span['items'] += 1
+                            yield item
+                    except ValueError as e:
+                        raise M2MApiError('INVALID_RESPONSE', str(e))
+                    except requests.RequestException as e:
+                        # e.g. the connection was reset while the response was being read
+                        raise M2MApiError(type(e).__name__, str(e))
+            errorCode = parser.rest.get('errorCode')
+            if errorCode in AUTH_ERRORS and not refreshed:
+                headers = self.refresh_key(headers['X-Auth-Token'])
+                refreshed = True
+                continue
+            if errorCode == 'RATE_LIMIT_USER_DL' and not waited:
+                print('Rate limit exceeded. Will sleep for 15 minutes.')
+                self.wait_for_rate_limit()
+                waited = True
+                continue
+            if errorCode:
+                raise M2MApiError(errorCode, parser.rest.get('errorMessage'))
+            if response_info is not None and isinstance(parser.rest.get('data'), dict):
+                response_info.update(parser.rest['data'])
+            return
+
+    def request_chunks(self, request_code: str, chunks: list, **kwargs) -> list:
+        """
+        Send one request per chunk using a bounded pool of worker threads.
+        :param request_code: Indicating method to API (e.g. 'download-options')
+        :param chunks: list of (param_name, param_value) tuples, one per request
+        :param kwargs: parameters shared by all requests
+        :return: list of API responses in the same order as chunks
+        """
+        return list(self.iter_request_chunks(request_code, chunks, **kwargs))
+
+    def iter_request_chunks(self, request_code: str, chunks: list, **kwargs):
+        """
+        Same as request_chunks, but yield each response as soon as it and all previous responses are available.
+        :return: generator yielding API responses in the same order as chunks
+        """
+        def send(chunk):
+            name, value = chunk
+            return self.request(request_code, **{**kwargs, name: value})
+
+        if self.n_workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield send(chunk)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.n_workers, len(chunks))) as executor:
+            yield from executor.map(send, chunks)
+
+    def scene_search_pages(self, page_size: int = 10000, max_results: int = None, **kwargs):
+        """
+        Search for scenes matching search criteria, requesting the results page by page.
+        :param page_size: number of results requested per scene-search call
+        :param max_results: maximum number of results returned in total, no limit if None
+        :param kwargs: search criteria, see scene_search
+        :return: generator yielding one list of scene dicts per page
+        """
+        searchParams = self.create_search_params(**kwargs)
+        startingNumber = 1
+        n_returned = 0
+        while max_results is None or n_returned < max_results:
+            n_request = page_size if max_results is None else min(page_size, max_results - n_returned)
+            searchParams.update(startingNumber=startingNumber, maxResults=n_request)
+            if self.stream_responses:
+                response = {}
+                results = list(self.stream_request(
+                    'scene-search', ('data', 'results'), compact_scene, response_info=response, **searchParams
+                ))
+            else:
+                response = self.request('scene-search', **searchParams)
+                results = response.get('results') or []
+            if not results:
+                break
+            n_returned += len(results)
+            yield results
+
+            nextRecord = response.get('nextRecord') or startingNumber + len(results)
+            totalHits = response.get('totalHits') or 0
+            if nextRecord <= startingNumber or nextRecord > totalHits:
+                break
+            startingNumber = nextRecord
+
+    def scene_search(self,
+                     start: str, end: str,
+                     dataset_name: str = None, entity_id=None,
+                     seasonal_filter: list = None, pr_list: list = None,
+                     ingest_filter: list = None, spatial_filter: dict = None,
+                     max_results: int = None, page_size: int = 10000, **kwargs):
+        """
+        Search for scenes matching search criteria
+        :param start: Temporal filter: start date
+        :param end: Temporal filter: end date
+        :param dataset_name: Name of the dataset to be queried (e.g. 'landsat_ot_c2_l1')
+        :param entity_id: Entity ID to directly search for scenes
+                          (legacy identifier in the format 'LC81920272020347LGN00')
+        :param seasonal_filter: Temporal filter: months to be included (list of int)
+        :param pr_list: Filter by path/row (list of int or str)
+        :param ingest_filter: Filter by date of ingestion into the archive (list of start and end date)
+        :param spatial_filter: M2M spatialFilter dict (e.g. from aoi.Aoi.spatial_filter)
+        :param max_results: maximum number of results returned, no limit if None
+        :param page_size: number of results requested per scene-search call
+        :param kwargs: additional filters for the metadataFilter childFilters
+        :return: List containing one dict per scene
+        """
+        scenes = []
+        for page in self.scene_search_pages(
+                page_size=page_size, max_results=max_results,
+                start=start, end=end, dataset_name=dataset_name, entity_id=entity_id,
+                seasonal_filter=seasonal_filter, pr_list=pr_list, ingest_filter=ingest_filter,
+                spatial_filter=spatial_filter, **kwargs
+        ):
+            scenes.extend(page)
+        return scenes
+
+    def planned_scene_pages(self, pr_list: list, start: str, end: str,
+                            max_rectangles: int = 8, max_results_per_query: int = 10000, **kwargs):
+        """
+        Split a search into sub-queries of tight path/row rectangles and date windows (see planner.plan_queries),
+        run them concurrently and merge the results without duplicates.
+        Pages are handed over through a bounded queue as soon as they are received, so that their scenes can be
+        processed while the sub-queries are still running.
+        :param pr_list: list of tiles in the format PPPRRR
+        :param start: Temporal filter: start date
+        :param end: Temporal filter: end date
+        :param max_rectangles: maximum number of path/row rectangles
+        :param max_results_per_query: maximum number of expected results per sub-query
+        :param kwargs: additional search criteria, see scene_search
+        :return: generator yielding one list of scene dicts per page
+        """
+        queries = planner.plan_queries(pr_list, start, end, max_rectangles, max_results_per_query)
+        seenIds = set()
+
+        def new_scenes(page):
+            scenes = [scene for scene in page if scene['entityId'] not in seenIds]
+            seenIds.update(scene['entityId'] for scene in scenes)
+            return scenes
+
+        if self.n_workers == 1 or len(queries) <= 1:
+            for query in queries:
+                for page in self.scene_search_pages(**query, **kwargs):
+                    page = new_scenes(page)
+                    if page:
+                        yield page
+            return
+
+        pages = queue.Queue(maxsize=2 * self.n_workers)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            # give up once the generator was closed, nobody takes items from the queue anymore
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def search(query):
+            # each sub-query puts its pages, an exception if it failed, and finally None
+            try:
+                for page in self.scene_search_pages(**query, **kwargs):
+                    if not put(page):
+                        return
+            except Exception as e:
+                put(e)
+            finally:
+                put(None)
+
+        with ThreadPoolExecutor(max_workers=min(self.n_workers, len(queries))) as executor:
+            for query in queries:
+                executor.submit(search, query)
+            try:
+                nRunning = len(queries)
+                while nRunning:
+                    item = pages.get()
+                    if item is None:
+                        nRunning -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        page = new_scenes(item)
+                        if page:
+                            yield page
+            finally:
+                stop.set()
+
+    def report_expected_wait(self, n_scenes: int, chunk_size: int, task: str) -> None:
+        """Print the expected time spent waiting for the rate limit when requesting n_scenes."""
+        wait = self.rate_limiter.expected_wait(n_scenes, chunk_size)
+        if wait > 0:
+            print(f'Rate limit: {task} for {n_scenes} scenes will pause for about {round(wait / 60)} min '
+                  f'to stay below {self.rate_limiter.max_scenes} scenes/{round(self.rate_limiter.window / 60)} min.')
+
+    def track_ingest_dates(self, scenes: list) -> None:
+        """Update latest_ingest_date from the publishDate of scene-search results."""
+        dates = [scene['publishDate'][:10] for scene in scenes if scene.get('publishDate')]
+        if dates and (self.latest_ingest_date is None or max(dates) > self.latest_ingest_date):
+            self.latest_ingest_date = max(dates)
+
+    def request_download_options(self, dataset_name: str, entity_ids: list) -> list:
+        """
+        Send a single download-options request.
+        :return: download options, reduced to product bundles if responses are streamed
+        """
+        if self.stream_responses:
+            return list(self.stream_request(
+                'download-options', ('data',), compact_download_option,
+                datasetName=dataset_name, entityIds=entity_ids
+            ))
+        return self.request('download-options', datasetName=dataset_name, entityIds=entity_ids)
+
+    def get_download_options(self, dataset_name, scene_ids):
+        """
+        Retrieve download options, filter out the product bundles.
+        Entity IDs are split into chunks of 5000 that are sent concurrently by up to n_workers threads.
+        :param dataset_name: Name of the dataset to be queried (e.g., 'landsat_ot_c2_l1')
+        :param scene_ids: List of entityIds (legacy scene identifiers, e.g., 'LC81920272020347LGN00')
+        :return: ProductCollection containing entity id, product id, display id, and filesize for each
+                 collection 2 level-1 product bundle
+        """
+
+        sceneIdsSplit = [scene_ids[i:i + 5000] for i in range(0, len(scene_ids), 5000)]
+        dlOptions = []
+        with ThreadPoolExecutor(max_workers=max(min(self.n_workers, len(sceneIdsSplit)), 1)) as executor:
+            for response in executor.map(lambda ids: self.request_download_options(dataset_name, ids), sceneIdsSplit):
+                dlOptions.extend(response)
+
+        return self.filter_product_bundles(dlOptions)
+
+    def retrieve_search_results(
+            self, datasetName, data_type_l1, tier,
+            start, end, seasonalFilter, ingestFilter,
+            minCC, maxCC,
+            prList, spatialFilter=None, cache=None, coverageFilter=None
+    ):
+        """
+        Combine scene_search and get_download_options, filter the results by allowed path/row, and get total size.
+        The search is split into concurrent sub-queries by planned_scene_pages. Download options are requested in
+        chunks of 5000 scenes in the background as soon as enough scenes are available, while later pages are still
+        loading.
+        :param spatialFilter: optional M2M spatialFilter dict, lets the API drop scenes not intersecting the AOI
+        :param cache: optional cache.SceneCache, see retrieve_cached_search_results
+        :param coverageFilter: optional function taking a scene dict and returning False for scenes whose footprint
+                               does not overlap the AOI enough (see aoi.Aoi.coverage_filter), applied before download
+                               options are requested
+        :return: ProductCollection containing scene IDs, legacy IDs, and filesize for each scene
+        """
+        if cache is not None:
+            fullIngestRange = not ingestFilter or (
+                    ingestFilter[0] <= '1970-01-01' and ingestFilter[1] >= date.today().strftime('%Y-%m-%d')
+            )
+            # the API filters by land cloud cover, scene-search results only include the cloud cover of the scene
+            fullCloudRange = float(minCC) <= -1 and float(maxCC) >= 100
+            if spatialFilter or not fullIngestRange or not fullCloudRange:
+                print('Note: the scene cache is not used in combination with spatial, cloud cover, or ingest date '
+                      'filters.')
+            else:
+                return self.retrieve_cached_search_results(
+                    cache=cache, datasetName=datasetName, data_type_l1=data_type_l1, tier=tier,
+                    start=start, end=end, seasonalFilter=seasonalFilter, prList=prList,
+                    coverageFilter=coverageFilter
+                )
+
+        pages = self.planned_scene_pages(
+            dataset_name=datasetName,
+            pr_list=prList,
+            start=start, end=end, seasonal_filter=seasonalFilter,
+            ingest_filter=ingestFilter, spatial_filter=spatialFilter,
+            min_cc=minCC, max_cc=maxCC,
+            data_type_l1=data_type_l1, tier=tier
+        )
+
+        futures = []
+        legacyIds = []
+        nScenes = 0
+        nDropped = 0
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            for page in pages:
+                filteredPage = utils.filter_results_by_pr(page, prList)
+                self.track_ingest_dates(filteredPage)
+                if coverageFilter:
+                    coveredPage = [scene for scene in filteredPage if coverageFilter(scene)]
+                    nDropped += len(filteredPage) - len(coveredPage)
+                    filteredPage = coveredPage
+                maxScenes = self.rate_limiter.max_scenes
+                if nScenes < maxScenes <= nScenes + len(filteredPage):
+                    print(f'Note: The M2M API only allows requesting {maxScenes} scenes/'
+                          f'{round(self.rate_limiter.window / 60)} min. '
+                          f'{utils.PROG_NAME} will pace its requests to stay below the limit.')
+                nScenes += len(filteredPage)
+                legacyIds.extend(s.get('entityId') for s in filteredPage)
+                while len(legacyIds) >= 5000:
+                    chunk, legacyIds = legacyIds[:5000], legacyIds[5000:]
+                    futures.append(executor.submit(self.request_download_options, datasetName, chunk))
+            if legacyIds:
+                futures.append(executor.submit(self.request_download_options, datasetName, legacyIds))
+
+            dlOptions = []
+            for future in futures:
+                dlOptions.extend(future.result())
+
+        if nDropped:
+            print(f'{nDropped} scenes skipped, their footprint does not overlap the AOI enough.')
+        return self.filter_product_bundles(dlOptions)
+
+    def retrieve_cached_search_results(
+            self, cache, datasetName, data_type_l1, tier,
+            start, end, seasonalFilter,
+            prList, coverageFilter=None
+    ):
+        """
+        Same as retrieve_search_results without cloud cover, spatial, and ingest date filters, but answer from a local
+        scene cache where possible.
+        Only date ranges not cached yet are requested from the API, without seasonal filter so that the results are
+        complete for each tile. The seasonal filter is then applied locally.
+        :param cache: cache.SceneCache
+        :param coverageFilter: see retrieve_search_results, applied to the cached scenes. Scenes cached without
+                               spatialCoverage are kept.
+        :return: ProductCollection containing scene IDs, legacy IDs, and filesize for each scene
+        """
+        level = data_type_l1 or 'L1TP'
+        tier = tier or 'T1'
+        gaps = cache.find_gaps(datasetName, level, tier, prList, start, end)
+        for (gapStart, gapEnd), gapTiles in gaps.items():
+            for page in self.planned_scene_pages(
+                    dataset_name=datasetName, pr_list=gapTiles, start=gapStart, end=gapEnd,
+                    data_type_l1=level, tier=tier
+            ):
+                filteredPage = utils.filter_results_by_pr(page, gapTiles)
+                self.track_ingest_dates(filteredPage)
+                cache.add_scenes(datasetName, filteredPage)
+            cache.add_coverage(datasetName, level, tier, gapTiles, gapStart, gapEnd)
+
+        scenes = cache.get_scenes(datasetName, level, tier, prList, start, end, months=seasonalFilter)
+        if coverageFilter:
+            coveredScenes = [scene for scene in scenes if coverageFilter(scene)]
+            if len(coveredScenes) < len(scenes):
+                print(f'{len(scenes) - len(coveredScenes)} scenes skipped, '
+                      f'their footprint does not overlap the AOI enough.')
+            scenes = coveredScenes
+        missingIds = [s['entityId'] for s in scenes if s['productId'] is None]
+        self.report_expected_wait(len(missingIds), 5000, 'requesting download options')
+        if missingIds:
+            cache.add_products(datasetName, self.get_download_options(datasetName, missingIds))
+            coveredIds = {scene['entityId'] for scene in scenes}
+            scenes = [
+                scene for scene in cache.get_scenes(
+                    datasetName, level, tier, prList, start, end, months=seasonalFilter
+                )
+                if scene['entityId'] in coveredIds
+            ]
+
+        return ProductCollection.from_dicts(s for s in scenes if s['productId'] is not None)
+
+    def get_download_links(self, dl_product_ids, poll_interval: float = 30, poll_timeout: float = 3600):
+        """
+        Retrieve download links for product bundles.
+        Requests are split into chunks of 1000 as large numbers have been leading to issues.
+        Chunks are sent concurrently by up to n_workers threads.
+        :param dl_product_ids: ProductCollection from get_download_options, or list of dicts with entityId and
+                               productId (e.g., '5e81f14ff4f9941c')
+        :param poll_interval: seconds between download-retrieve requests for downloads that are still being prepared
+        :param poll_timeout: seconds to wait for downloads that are still being prepared
+        :return: List of download urls
+        """
+        return list(self.iter_download_links(dl_product_ids, poll_interval, poll_timeout))
+
+    def iter_download_links(self, dl_product_ids, poll_interval: float = 30, poll_timeout: float = 3600):
+        """
+        Generate download links for product bundles, see get_download_links.
+        Links of available downloads are yielded right away. Downloads that are still being prepared (staged)
+        are tracked by their downloadId and polled in the background using download-retrieve, their links are
+        yielded as soon as they are ready. Links of downloads that are not ready after poll_timeout seconds are
+        yielded as returned by download-request.
+        :return: generator yielding download urls
+        """
+        downloads = dl_product_ids.to_downloads() \
+            if isinstance(dl_product_ids, ProductCollection) else dl_product_ids
+        self.report_expected_wait(len(downloads), 1000, 'generating download links')
+        dlSplit = [('downloads', downloads[i:i + 1000]) for i in range(0, len(downloads), 1000)]
+        # label to retrieve the downloads of this request later on
+        label = f'{utils.PROG_NAME}_{uuid.uuid4().hex[:16]}'
+        poller = DownloadPoller(self, label, poll_interval)
+
+        # Call the download request to get the download urls
+        for response in self.iter_request_chunks('download-request', dlSplit, label=label):
+            for download in response['availableDownloads']:
+                yield download['url']
+            preparing = response['preparingDownloads']
+            if preparing:
+                poller.add({download['downloadId']: download['url'] for download in preparing})
+            # hand over downloads that became ready in the meantime
+            yield from poller.ready_urls()
+
+        if poller.n_pending:
+            print(f'{poller.n_pending} product bundles are being prepared by USGS, waiting for their download links.')
+        yield from poller.wait(poll_timeout)
+
+
+class DownloadPoller(object):
+    """
+    Background thread polling download-retrieve for downloads that are still being prepared by USGS.
+    Pending downloads are tracked by their downloadId; the urls of downloads that became available are put on a
+    queue to be handed to the downloader.
+    """
+
+    def __init__(self, api: eeapi, label: str, poll_interval: float = 30):
+        self.api = api
+        self.label = label
+        self.poll_interval = poll_interval
+        self.pending = {}
+        self.ready = queue.Queue()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def n_pending(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def add(self, downloads: dict) -> None:
+        """Track downloads, dict of downloadId: url. Starts the polling thread if necessary."""
+        with self.lock:
+            self.pending.update(downloads)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.poll_interval):
+            if not self.n_pending:
+                continue
+            try:
+                response = self.api.request('download-retrieve', label=self.label)
+            except M2MApiError as e:
+                print(f'Warning: could not retrieve prepared downloads: {e}')
+                continue
+            with self.lock:
+                for download in response.get('available') or []:
+                    url = download.get('url')
+                    if download.get('downloadId') in self.pending and url:
+                        del self.pending[download['downloadId']]
+                        self.ready.put(url)
+
+    def ready_urls(self) -> list:
+        """Urls of downloads that became available since the last call."""
+        urls = []
+        while not self.ready.empty():
+            urls.append(self.ready.get())
+        return urls
+
+    def wait(self, timeout: float):
+        """
+        Yield urls as downloads become available until all are ready or timeout seconds have passed.
+        Urls of downloads that are still pending after the timeout are yielded as returned by download-request.
+        """
+        deadline = time.time() + timeout
+        while self.n_pending and time.time() < deadline:
+            try:
+                yield self.ready.get(timeout=min(self.poll_interval, max(deadline - time.time(), 0)))
+            except queue.Empty:
+                pass
+        self.stop_event.set()
+        yield from self.ready_urls()
+        with self.lock:
+            remaining, self.pending = list(self.pending.values()), {}
+        if remaining:
+            print(f'Warning: {len(remaining)} product bundles were not ready after {round(timeout / 60)} min, '
+                  f'their download links may not work yet.')
+        yield from remaining
@@ -0,0 +1,7 @@
+class M2MApiError(Exception):
+    """Error returned by the M2M API, or a request that failed despite retrying."""
+
+    def __init__(self, error_code: str, error_message: str):
+        self.error_code = error_code
+        self.error_message = error_message
+        super().__init__(f'{error_code}: {error_message}')
@@ -0,0 +1,130 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+class StreamingJsonParser:
+    """
+    Incremental parser for JSON documents that contain one large array, e.g. the results of an M2M API response.
+    The array at path (a sequence of object keys, e.g. ('data', 'results')) is parsed item by item from a stream
+    of byte chunks, so neither the full response body nor the full decoded array are held in memory.
+    All other values are decoded regularly and available in the rest attribute after iterating the items,
+    e.g. rest['errorCode'] or rest['data']['totalHits'].
+    """
+
+    def __init__(self, chunks, path: tuple, compact=None, chunk_size: int = 65536):
+        """
+        :param chunks: iterable of bytes, e.g. requests.Response.iter_content(chunk_size)
+        :param path: object keys leading to the array to stream
+        :param compact: optional function applied to each item, items for which it returns None are dropped
+        :param chunk_size: buffered characters after which consumed input is discarded
+        """
+        self.chunks = iter(chunks)
+        self.path = tuple(path)
+        self.compact = compact
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+        self.rest = {}
+
+    def fill(self) -> bool:
+        """Read the next chunk into the buffer, return False if the stream is exhausted."""
+        if self.exhausted:
+            return False
+        if self.pos > self.chunk_size:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        try:
+            self.buffer += self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.buffer += self.decoder.decode(b'', final=True)
+            self.exhausted = True
+        return True
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError('Unexpected end of JSON stream')
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f'Invalid JSON stream: expected one of {chars!r}, got {char!r} at position {self.pos}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+    def items(self):
+        """
+        Parse the document, yielding the (compacted) items of the array at path.
+        :return: generator
+        """
+        yield from self.parse_object(self.rest, 0)
+        if self.peek_end():
+            return
+        raise ValueError('Invalid JSON stream: unexpected data after document')
+
+    def peek_end(self) -> bool:
+        try:
+            self.peek()
+        except ValueError:
+            return True
+        return False
+
+    def parse_object(self, target: dict, depth: int):
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if key == self.path[depth] and self.peek() in '[{':
+                if depth == len(self.path) - 1 and self.peek() == '[':
+                    yield from self.parse_array()
+                elif depth < len(self.path) - 1 and self.peek() == '{':
+                    target[key] = {}
+                    yield from self.parse_object(target[key], depth + 1)
+                else:
+                    target[key] = self.value()
+            else:
+                target[key] = self.value()
+            if self.expect(',}') == '}':
+                return
+
+    def parse_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            item = self.value()
+            if self.compact:
+                item = self.compact(item)
+            if item is not None:
+                yield item
+            if self.expect(',]') == ']':
+                return
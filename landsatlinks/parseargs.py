@@ -29,15 +29,30 @@ def parse_cli_arguments():
     search_group = parser_search.add_mutually_exclusive_group()
     parser_search.add_argument(
         'aoi',
+        nargs='?',
         help='Path to AOI file. '
-             'Supported formats: .txt (one path/row per line in the format PPPRRR) or '
-             '.shp, .geojson, .gpkg (vector files).'
+             'Supported formats: .txt (one path/row per line in the format PPPRRR), '
+             '.csv (one longitude,latitude point per line), or .shp, .geojson, .gpkg (vector files).\n'
+             'Omitted if --bbox or --points is used.'
     )
     parser_search.add_argument(
         'output_dir',
         help='Path to the output directory where the download links and downloaded products will be stored.'
     )
     # optional arguments
+    aoi_group = parser_search.add_mutually_exclusive_group()
+    aoi_group.add_argument(
+        '--bbox',
+        default=None,
+        help='Bounding box used as AOI instead of an AOI file. Format: lon_min,lat_min,lon_max,lat_max (degrees).\n'
+             'Tiles are looked up in a bundled WRS-2 index, GDAL is not needed.'
+    )
+    aoi_group.add_argument(
+        '--points',
+        default=None,
+        help='CSV file with points (longitude, latitude) used as AOI instead of an AOI file.\n'
+             'Tiles are looked up in a bundled WRS-2 index, GDAL is not needed.'
+    )
     parser_search.add_argument(
         '-s', '--sensor',
         default='TM,ETM,OLI',
@@ -105,6 +120,71 @@ def parse_cli_arguments():
             'a) 1st line: user, 2nd line: password - deprecated by the USGS API from February 2025\n'
             'b) 1st line: "app-token", 2nd line: user, 3rd line: token'
     )
+    parser_search.add_argument(
+        '--cache-login',
+        action='store_true',
+        help='Reuse the M2M API key of a previous run while it is valid instead of logging in again.\n'
+             'The key is stored in the cache directory, readable by the current user only.'
+    )
+    parser_search.add_argument(
+        '--spatial-filter',
+        choices=['mbr', 'geometry'],
+        default=None,
+        help='Additionally pass the AOI to the M2M API as a spatial filter (not for tile lists).\n'
+             'mbr: bounding box of the AOI, geometry: simplified AOI geometry.'
+    )
+    parser_search.add_argument(
+        '--min-overlap',
+        type=float,
+        default=None,
+        help='Skip scenes whose footprint overlaps the AOI by less than this fraction (0-1) of the footprint area, '
+             'or of the AOI area if the AOI is smaller, before download options are requested.\n'
+             'Point and line AOIs keep all scenes intersecting them. Not used for tile lists.'
+    )
+    parser_search.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only search for scenes ingested since the last successful run with the same AOI and filters.\n'
+             'The latest ingestion date seen is stored after links were written or products were downloaded.'
+    )
+    parser_search.add_argument(
+        '--cache',
+        action='store_true',
+        help='Use a local scene metadata cache and only request scenes from the API that are not cached yet.\n'
+             'Not used in combination with --spatial-filter or a restricted --ingestrange.'
+    )
+    parser_search.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='Parse large M2M API responses incrementally and keep only the fields needed, '
+             'to keep memory usage low for large searches.'
+    )
+    parser_search.add_argument(
+        '-w', '--api-workers',
+        type=int,
+        default=4,
+        help='Number of concurrent requests sent to the M2M API when retrieving download options and links.\n'
+             'Default: 4'
+    )
+    parser_search.add_argument(
+        '-r', '--retries',
+        type=int,
+        default=5,
+        help='Number of retries with exponential backoff after transient M2M API errors '
+             '(connection errors, server errors, invalid responses).\nDefault: 5'
+    )
+    parser_search.add_argument(
+        '--trace',
+        default=None,
+        help='Write timed spans of all phases, M2M API calls, rate limit waits, and downloads to this JSON trace '
+             'file (Chrome trace event format, e.g. for https://ui.perfetto.dev).'
+    )
+    parser_search.add_argument(
+        '--profile',
+        default=None,
+        help='Profile each phase with cProfile and write one .prof file per phase to this directory.\n'
+             'Also writes a trace file to the output directory if --trace is not set.'
+    )
 
 
     # Download parser arguments
@@ -126,5 +206,93 @@ def parse_cli_arguments():
         help='Path to FORCE queue file. Downloaded product bundles will be appended to the queue.',
         default=None
     )
+    parser_dl.add_argument(
+        '--trace',
+        default=None,
+        help='Write timed spans of the downloads to this JSON trace '
+             'file (Chrome trace event format, e.g. for https://ui.perfetto.dev).'
+    )
+    parser_dl.add_argument(
+        '--profile',
+        default=None,
+        help='Profile each phase with cProfile and write one .prof file per phase to this directory.\n'
+             'Also writes a trace file to the output directory if --trace is not set.'
+    )
+
+    # Batch parser arguments
+    parser_batch = subparsers.add_parser(
+        'batch',
+        help='Run many searches (AOIs, filters, output directories) from a job file in one session with merged queries.'
+    )
+    parser_batch.add_argument(
+        'job_file',
+        help='Path to the JSON job file. Either a list of jobs, or an object with "defaults" (settings shared by all '
+             'jobs) and "jobs". Each job requires "output_dir" and one of "aoi", "bbox", or "points" and takes the '
+             'settings sensor, daterange, '
+             'cloudcover, months, ingestrange, tier, level, forcelogs, queue_file, url_file, download, and name.'
+    )
+    parser_batch.add_argument(
+        '-n', '--no-action',
+        action='store_true',
+        help='Only search for product bundles and print info per job without generating links or downloading.'
+    )
+    parser_batch.add_argument(
+        '--secret',
+        help='Path to the file containing the username and password/app-token for M2MApi access (EarthExplorer login).'
+    )
+    parser_batch.add_argument(
+        '--cache-login',
+        action='store_true',
+        help='Reuse the M2M API key of a previous run while it is valid instead of logging in again.'
+    )
+    parser_batch.add_argument(
+        '--cache',
+        action='store_true',
+        help='Use the local scene metadata cache, see landsatlinks search --cache.'
+    )
+    parser_batch.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='Parse large M2M API responses incrementally and keep only the fields needed.'
+    )
+    parser_batch.add_argument(
+        '-w', '--api-workers',
+        type=int,
+        default=4,
+        help='Number of concurrent requests sent to the M2M API.\nDefault: 4'
+    )
+    parser_batch.add_argument(
+        '-r', '--retries',
+        type=int,
+        default=5,
+        help='Number of retries with exponential backoff after transient M2M API errors.\nDefault: 5'
+    )
+    parser_batch.add_argument(
+        '--trace',
+        default=None,
+        help='Write timed spans of all phases and M2M API calls to this JSON trace file.'
+    )
+    parser_batch.add_argument(
+        '--profile',
+        default=None,
+        help='Profile each phase with cProfile and write one .prof file per phase to this directory.'
+    )
+
+    # Cache parser arguments
+    parser_cache = subparsers.add_parser(
+        'cache',
+        help='Show information about or invalidate the local scene metadata cache.'
+    )
+    parser_cache.add_argument(
+        'cache_action',
+        choices=['info', 'invalidate'],
+        help='info: print cache location and size, invalidate: remove cached entries.'
+    )
+    parser_cache.add_argument(
+        '-s', '--sensor',
+        choices=['TM', 'ETM', 'OLI'],
+        default=None,
+        help='Only invalidate cached entries of this sensor. Default: all sensors'
+    )
 
     return parser.parse_args()
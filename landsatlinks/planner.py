@@ -0,0 +1,163 @@
+import heapq
+from datetime import datetime, timedelta
+
+# Landsat revisit time in days and the maximum number of satellites acquiring simultaneously
+REVISIT_DAYS = 16
+MAX_SATELLITES = 2
+
+
+def tile_runs(pr_list: list) -> list:
+    """
+    Group tiles into runs of consecutive rows within the same path.
+    :param pr_list: list of tiles in the format PPPRRR
+    :return: list of rectangles (path_min, path_max, row_min, row_max)
+    """
+    tiles = sorted({(int(pr[0:3]), int(pr[3:6])) for pr in pr_list})
+    runs = []
+    for path, row in tiles:
+        if runs and runs[-1][0] == path and runs[-1][3] == row - 1:
+            runs[-1] = (path, path, runs[-1][2], row)
+        else:
+            runs.append((path, path, row, row))
+    return runs
+
+
+def rectangle_area(rect: tuple) -> int:
+    return (rect[1] - rect[0] + 1) * (rect[3] - rect[2] + 1)
+
+
+def merge_rectangles(a: tuple, b: tuple) -> tuple:
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+def neighbor_pairs(rects: list, k: int) -> set:
+    """
+    Candidate pairs of rectangles for merging: each rectangle and the k rectangles following it when sorted by path
+    and when sorted by row, instead of all pairs.
+    :return: set of index pairs (i, j) with i < j
+    """
+    pairs = set()
+    for key in (lambda i: (rects[i][0], rects[i][2]), lambda i: (rects[i][2], rects[i][0])):
+        order = sorted(range(len(rects)), key=key)
+        for n, i in enumerate(order):
+            for j in order[n + 1:n + 1 + k]:
+                pairs.add((min(i, j), max(i, j)))
+    return pairs
+
+
+def partition_tiles(pr_list: list, max_rectangles: int = 8, k_neighbors: int = 8) -> list:
+    """
+    Split a tile list into a small number of tight path/row rectangles.
+    Rectangles are merged greedily, always choosing the merge that adds the fewest tiles that were not requested.
+    Merges that do not add any unrequested tiles are always applied, other merges only while there are more than
+    max_rectangles rectangles. Only merges of neighboring rectangles are considered (see neighbor_pairs), a merged
+    rectangle inherits the neighbors of both parts.
+    :param pr_list: list of tiles in the format PPPRRR
+    :param max_rectangles: maximum number of rectangles returned
+    :param k_neighbors: number of neighbors per rectangle and sort order considered for merging
+    :return: list of rectangles (path_min, path_max, row_min, row_max)
+    """
+    rects = tile_runs(pr_list)
+
+    # 2D prefix sums over the tile grid to count requested tiles inside a rectangle in constant time
+    p_max = max(rect[1] for rect in rects)
+    r_max = max(rect[3] for rect in rects)
+    counts = [[0] * (r_max + 1) for _ in range(p_max + 1)]
+    for pr in set(pr_list):
+        counts[int(pr[0:3])][int(pr[3:6])] = 1
+    for p in range(p_max + 1):
+        for r in range(r_max + 1):
+            counts[p][r] += (counts[p - 1][r] if p else 0) + (counts[p][r - 1] if r else 0) \
+                - (counts[p - 1][r - 1] if p and r else 0)
+
+    def covered(rect):
+        p0, p1, r0, r1 = rect
+        return counts[p1][r1] - (counts[p0 - 1][r1] if p0 else 0) - (counts[p1][r0 - 1] if r0 else 0) \
+            + (counts[p0 - 1][r0 - 1] if p0 and r0 else 0)
+
+    def waste(rect):
+        return rectangle_area(rect) - covered(rect)
+
+    # candidate merges are kept in a heap, entries referring to already merged rectangles are skipped lazily
+    active = {i: (rect, waste(rect)) for i, rect in enumerate(rects)}
+    neighbors = {i: set() for i in active}
+    heap = []
+
+    def push_merge(i, j):
+        (rect_i, waste_i), (rect_j, waste_j) = active[i], active[j]
+        merged = merge_rectangles(rect_i, rect_j)
+        heapq.heappush(heap, (waste(merged) - waste_i - waste_j, min(i, j), max(i, j), merged))
+
+    for i, j in neighbor_pairs(rects, k_neighbors):
+        neighbors[i].add(j)
+        neighbors[j].add(i)
+        push_merge(i, j)
+
+    next_id = len(rects)
+    while heap and len(active) > 1:
+        cost, i, j, merged = heapq.heappop(heap)
+        if i not in active or j not in active:
+            continue
+        if cost > 0 and len(active) <= max_rectangles:
+            break
+        merged_waste = active.pop(i)[1] + active.pop(j)[1] + cost
+        active[next_id] = (merged, merged_waste)
+        neighbors[next_id] = (neighbors.pop(i) | neighbors.pop(j)) - {i, j}
+        for n in neighbors[next_id]:
+            neighbors[n] -= {i, j}
+            neighbors[n].add(next_id)
+            push_merge(next_id, n)
+        next_id += 1
+
+    rects = [rect for rect, _ in active.values()]
+    return sorted(rects)
+
+
+def partition_dates(start: str, end: str, n_tiles: int, max_results: int = 10000, max_windows: int = 16) -> list:
+    """
+    Split a date range into windows that are expected to return fewer than max_results scenes
+    for n_tiles tiles. Windows are only a way to run sub-queries concurrently, larger results are paged by
+    eeapi.scene_search_pages, so the number of windows is capped at max_windows.
+    :param start: start date (YYYY-MM-DD)
+    :param end: end date (YYYY-MM-DD)
+    :param n_tiles: number of requested tiles covered by the query
+    :param max_results: maximum number of expected results per window
+    :param max_windows: maximum number of windows
+    :return: list of (start, end) tuples (YYYY-MM-DD)
+    """
+    start_date = datetime.strptime(start, '%Y-%m-%d')
+    end_date = datetime.strptime(end, '%Y-%m-%d')
+    scenes_per_day = max(n_tiles, 1) * MAX_SATELLITES / REVISIT_DAYS
+    n_days = (end_date - start_date).days + 1
+    window_days = max(int(max_results / scenes_per_day), -(-n_days // max_windows), 1)
+
+    windows = []
+    window_start = start_date
+    while window_start <= end_date:
+        window_end = min(window_start + timedelta(days=window_days - 1), end_date)
+        windows.append((window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+        window_start = window_end + timedelta(days=1)
+    return windows
+
+
+def plan_queries(pr_list: list, start: str, end: str, max_rectangles: int = 8, max_results: int = 10000) -> list:
+    """
+    Split a search into sub-queries of tight path/row rectangles and date windows.
+    :param pr_list: list of tiles in the format PPPRRR
+    :param start: start date (YYYY-MM-DD)
+    :param end: end date (YYYY-MM-DD)
+    :param max_rectangles: maximum number of path/row rectangles
+    :param max_results: maximum number of expected results per sub-query
+    :return: list of dicts with the keys pr_list (corner tiles of the rectangle), start, and end
+    """
+    if not pr_list:
+        return [{'pr_list': pr_list, 'start': start, 'end': end}]
+
+    tiles = {(int(pr[0:3]), int(pr[3:6])) for pr in pr_list}
+    queries = []
+    for rect in partition_tiles(pr_list, max_rectangles):
+        corners = [f'{rect[0]:03d}{rect[2]:03d}', f'{rect[1]:03d}{rect[3]:03d}']
+        n_tiles = sum(1 for path, row in tiles if rect[0] <= path <= rect[1] and rect[2] <= row <= rect[3])
+        for window_start, window_end in partition_dates(start, end, n_tiles, max_results):
+            queries.append({'pr_list': corners, 'start': window_start, 'end': window_end})
+    return queries
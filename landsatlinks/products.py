@@ -0,0 +1,74 @@
+class ProductBundle(object):
+    """
+    Compact record of a Landsat Collection 2 Level-1 product bundle found by a search.
+    Path/row and acquisition date are derived from the display ID (e.g. 'LC08_L1TP_192023_20200101_...').
+    """
+    __slots__ = ('entity_id', 'product_id', 'display_id', 'filesize', 'path_row', 'acq_date')
+
+    def __init__(self, entity_id: str, product_id: str, display_id: str, filesize: int):
+        self.entity_id = entity_id
+        self.product_id = product_id
+        self.display_id = display_id
+        self.filesize = filesize or 0
+        self.path_row = display_id[10:16]
+        self.acq_date = display_id[17:25]
+
+    @classmethod
+    def from_dict(cls, product: dict):
+        """Create from a dict with the keys entityId, productId, displayId, and filesize."""
+        return cls(product['entityId'], product['productId'], product['displayId'], product['filesize'])
+
+    def to_download(self) -> dict:
+        """Entry of the downloads list of a download-request."""
+        return {'entityId': self.entity_id, 'productId': self.product_id}
+
+    def __repr__(self):
+        return f'ProductBundle({self.display_id})'
+
+
+class ProductCollection(object):
+    """
+    List of ProductBundles with set-based filters and a cached total size.
+    """
+
+    def __init__(self, products=()):
+        self.products = list(products)
+        self.cached_total_size = None
+
+    @classmethod
+    def from_dicts(cls, products: list):
+        return cls(ProductBundle.from_dict(product) for product in products)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def __bool__(self):
+        return bool(self.products)
+
+    def extend(self, products) -> None:
+        self.products.extend(products)
+        self.cached_total_size = None
+
+    @property
+    def total_size(self) -> int:
+        """Total file size of all products in bytes."""
+        if self.cached_total_size is None:
+            self.cached_total_size = sum(product.filesize for product in self.products)
+        return self.cached_total_size
+
+    @property
+    def display_ids(self) -> set:
+        return {product.display_id for product in self.products}
+
+    def exclude(self, display_ids) -> 'ProductCollection':
+        """Products whose display ID is not in display_ids (set, or any iterable)."""
+        if not isinstance(display_ids, (set, frozenset)):
+            display_ids = set(display_ids)
+        return ProductCollection(product for product in self.products if product.display_id not in display_ids)
+
+    def to_downloads(self) -> list:
+        """Downloads list of a download-request."""
+        return [product.to_download() for product in self.products]
@@ -0,0 +1,71 @@
+import threading
+import time
+
+# The M2M API allows requesting download options/downloads for 15000 scenes per 15 minutes
+MAX_SCENES = 15000
+WINDOW_SECONDS = 900
+
+
+class SceneRateLimiter:
+    """
+    Client-side scheduler for the M2M scene rate limit.
+    Keeps track of the number of scenes requested in a rolling time window and delays requests that would
+    exceed the limit until enough scenes have left the window. Thread-safe: every call to acquire reserves
+    its time slot before sleeping, so concurrent requests are paced in the order they arrive.
+    """
+
+    def __init__(self, max_scenes: int = MAX_SCENES, window: float = WINDOW_SECONDS):
+        self.max_scenes = max_scenes
+        self.window = window
+        # list of (timestamp, number of scenes) of past and reserved requests
+        self.events = []
+        self.lock = threading.Lock()
+
+    def next_slot(self, events: list, n: int, now: float) -> float:
+        """Earliest time >= now at which n scenes can be requested without exceeding the limit."""
+        n = min(n, self.max_scenes)
+        for t in [now] + [t + self.window for t, _ in events if t + self.window > now]:
+            in_window = sum(count for event_t, count in events if event_t > t - self.window)
+            if in_window + n <= self.max_scenes:
+                return t
+        return now
+
+    def reserve(self, n: int) -> float:
+        """
+        Reserve the earliest time slot at which n scenes can be requested without blocking.
+        :return: seconds to wait until the request may be sent
+        """
+        with self.lock:
+            now = time.time()
+            self.events = [(t, count) for t, count in self.events if t > now - self.window]
+            slot = self.next_slot(self.events, n, now)
+            self.events.append((slot, min(n, self.max_scenes)))
+            self.events.sort()
+        return max(slot - now, 0)
+
+    def acquire(self, n: int) -> float:
+        """
+        Block until n scenes can be requested and record the request.
+        :return: seconds waited
+        """
+        wait = self.reserve(n)
+        if wait > 0:
+            print(f'Rate limit: pausing {round(wait / 60, 1)} min to stay below '
+                  f'{self.max_scenes} scenes/{round(self.window / 60)} min.')
+            time.sleep(wait)
+        return wait
+
+    def expected_wait(self, n_total: int, chunk_size: int) -> float:
+        """
+        Estimate the total time spent waiting when requesting n_total scenes in chunks of chunk_size.
+        :return: seconds
+        """
+        with self.lock:
+            now = time.time()
+            events = [(t, count) for t, count in self.events if t > now - self.window]
+        slot = now
+        for i in range(0, n_total, chunk_size):
+            n = min(chunk_size, n_total - i)
+            slot = self.next_slot(events, n, slot)
+            events = sorted(events + [(slot, min(n, self.max_scenes))])
+        return slot - now
@@ -0,0 +1,79 @@
+import random
+import threading
+import time
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: before retry n (starting at 0) wait a random time between 0 and
+    min(backoff_max, backoff_base * 2 ** n) seconds.
+    """
+
+    def __init__(self, max_retries: int = 5, backoff_base: float = 2, backoff_max: float = 120):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Pauses all requests after failure_threshold consecutive failures.
+    While the circuit is open, callers block for reset_timeout seconds, then a single trial request is let through
+    (half-open) while the others wait for its result. A success closes the circuit again and the waiting callers
+    continue, a failure opens it again and lets the trial request and the waiting callers fail.
+    Thread-safe, shared by all threads using the same API session.
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 300):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.failed_trials = 0
+        self.condition = threading.Condition()
+
+    def allow_request(self) -> bool:
+        """
+        Block while the circuit is open.
+        :return: False if a trial request failed while this call was waiting, i.e. the API still seems unavailable
+        """
+        with self.condition:
+            failed_trials = self.failed_trials
+            while self.opened_at is not None:
+                if self.failed_trials != failed_trials:
+                    return False
+                if self.trial_running:
+                    self.condition.wait_for(lambda: not self.trial_running)
+                    continue
+                remaining = self.opened_at + self.reset_timeout - time.time()
+                if remaining <= 0:
+                    self.trial_running = True
+                    return True
+                self.condition.wait(remaining)
+            return True
+
+    def record_success(self) -> None:
+        with self.condition:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+            self.condition.notify_all()
+
+    def record_failure(self) -> bool:
+        """
+        :return: True if the failed request was the trial request of a half-open circuit
+        """
+        with self.condition:
+            self.failures += 1
+            trial_failed = self.trial_running
+            if trial_failed:
+                self.failed_trials += 1
+            if trial_failed or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                self.trial_running = False
+                self.condition.notify_all()
+            return trial_failed
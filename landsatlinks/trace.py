@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Tracer(object):
+    """
+    Records timed spans for the phases of a run (AOI intersection, search, filesystem checks, downloading, ...)
+    and for single M2M API calls and rate limit waits. Spans carry attributes such as bytes transferred, item
+    counts, and retries. The trace is written as JSON in the Chrome trace event format, which can be opened in
+    chrome://tracing or https://ui.perfetto.dev, together with a summary per span name.
+    Phases can additionally be profiled with cProfile, one .prof file per phase (main thread only).
+    A disabled tracer records nothing, so spans can be used unconditionally. Thread-safe.
+    """
+
+    def __init__(self):
+        self.fp = None
+        self.profile_dir = None
+        self.events = []
+        self.n_phases = 0
+        self.t0 = time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.fp is not None
+
+    def configure(self, fp: str = None, profile_dir: str = None) -> None:
+        """
+        :param fp: path of the JSON trace file, None to disable tracing
+        :param profile_dir: directory for the cProfile output of each phase, None to disable profiling
+        """
+        self.fp = fp
+        self.profile_dir = profile_dir
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def add(self, name: str, start: float, duration: float, category: str = 'api', **attrs) -> None:
+        """Record a span that was timed elsewhere, e.g. in another process. start is a time.time() timestamp."""
+        if not self.enabled:
+            return
+        event = {
+            'name': name, 'cat': category, 'ph': 'X',
+            'ts': round((start - self.t0) * 1e6), 'dur': round(duration * 1e6),
+            'pid': os.getpid(), 'tid': threading.get_ident(),
+            'args': {key: value for key, value in attrs.items() if value is not None},
+        }
+        with self.lock:
+            self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = 'api', **attrs):
+        """
+        Time the enclosed block. Yields the dict of span attributes, which can be updated inside the block
+        (e.g. span['bytes'] = ...).
+        """
+        if not self.enabled:
+            yield attrs
+            return
+        start = time.time()
+        try:
+            yield attrs
+        except Exception as e:
+            attrs['error'] = str(e)
+            raise
+        finally:
+            self.add(name, start, time.time() - start, category, **attrs)
+
+    @contextmanager
+    def phase(self, name: str, **attrs):
+        """Span of a phase of the run, profiled with cProfile if a profile directory is configured."""
+        if not self.profile_dir:
+            with self.span(name, 'phase', **attrs) as span:
+                yield span
+            return
+        import cProfile
+
+        self.n_phases += 1
+        filename = f'{self.n_phases:02d}_{re.sub("[^A-Za-z0-9]+", "_", name)}.prof'
+        profiler = cProfile.Profile()
+        with self.span(name, 'phase', **attrs) as span:
+            profiler.enable()
+            try:
+                yield span
+            finally:
+                profiler.disable()
+                profiler.dump_stats(os.path.join(self.profile_dir, filename))
+
+    def summary(self) -> dict:
+        """Number of spans, total seconds, bytes, items, and retries per span name."""
+        summary = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            entry = summary.setdefault(event['name'], {'category': event['cat'], 'count': 0, 'seconds': 0})
+            entry['count'] += 1
+            entry['seconds'] += event['dur'] / 1e6
+            for key in ('bytes', 'items', 'retries'):
+                if isinstance(event['args'].get(key), int):
+                    entry[key] = entry.get(key, 0) + event['args'][key]
+        for entry in summary.values():
+            entry['seconds'] = round(entry['seconds'], 3)
+        return summary
+
+    def write(self) -> None:
+        if not self.enabled:
+            return
+        summary = self.summary()
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event['ts'])
+        with open(self.fp, 'w') as f:
+            json.dump({'traceEvents': events, 'summary': summary, 'displayTimeUnit': 'ms'}, f, indent=1)
+        print(f'Trace written to {self.fp}')
+
+
+def count_items(data):
+    """Number of items (scenes, download options, downloads) in the data of an M2M API response."""
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict):
+        lists = [data[key] for key in ('results', 'availableDownloads', 'preparingDownloads', 'available')
+                 if isinstance(data.get(key), list)]
+        return sum(len(items) for items in lists) if lists else None
+    return None
+
+
+def count_bytes(chunks, span: dict):
+    """Pass through the chunks of a streamed response, adding up their size in span['bytes']."""
+    for chunk in chunks:
+        span['bytes'] = span.get('bytes', 0) + len(chunk)
+        yield chunk
+
+
+# shared by the command line interface, eeapi, and the download routine
+tracer = Tracer()
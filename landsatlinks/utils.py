@@ -4,11 +4,16 @@ import re
 import shutil
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from math import floor, log
-from pathlib import Path
 
-PRODUCT_ID_REGEX = re.compile('(L[CET]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_T1|T2|RT)')
+PRODUCT_ID_REGEX = re.compile('(L[CET]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_(?:T1|T2|RT))')
+# Landsat 5/7/8/9 Collection 1/2 Level 1 folders and archives (.tar/.tar.gz) or the aria2 control files of their
+# partial downloads, and FORCE Level-2 logs. Group 1 is the product ID, group 2 marks aria2 control files.
+SCENE_NAME_PATTERN = 'L[C-T]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_(?:RT|T1|T2)'
+PRODUCT_FILE_REGEX = re.compile(f'^({SCENE_NAME_PATTERN})(?:\\.tar)?(?:\\.gz)?(\\.aria2)?$')
+LOG_FILE_REGEX = re.compile(f'^({SCENE_NAME_PATTERN})(?:\\.tar)?\\.log$')
 PROG_NAME = os.path.basename(sys.argv[0])
 
 
@@ -22,50 +27,69 @@ def countdown(seconds: int):
     print('...resuming')
 
 
+def scan_directory(path: str, regex, prune: bool) -> tuple:
+    """
+    List the entries of a single directory whose names match regex.
+    Symlinked directories are not descended into.
+    :param prune: skip directories whose names match regex (e.g. extracted product bundles) when descending
+    :return: list of re.Match objects, list of subdirectories to scan
+    """
+    matches = []
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                match = regex.match(entry.name)
+                if match:
+                    matches.append(match)
+                    if prune:
+                        continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return matches, subdirs
+
+
 def find_files(search_path: str, search_type: str,
-               recursive: bool = True, no_partial_dls: bool = True) -> list:
+               recursive: bool = True, no_partial_dls: bool = True, n_workers: int = 8) -> set:
     """
-    Returns a list of names of tar(.gz) archives and folders, or logs, that are Landsat Level 1 products.
+    Returns the names of tar(.gz) archives and folders, or logs, that are Landsat Level 1 products.
+    Directories are scanned level by level with os.scandir, the directories of each level concurrently by up to
+    n_workers threads. Extracted product bundles are not descended into.
     :param no_partial_dls: If True, do not return product names if they are accompanied by aria2 temp files, to
     make sure partially downloaded files are going to be downloaded again.
+    :param n_workers: number of threads scanning directories
+    :return: set of product IDs
     """
-
-    path = Path(search_path)
-    if recursive:
-        glob_pattern = '**/*'
-    else:
-        glob_pattern = '*'
-    file_paths = list(path.glob(glob_pattern))
-
-    # match Landsat 5/7/8/9 Collection 1/2 Level 1 folders and archives (.tar/.tar.gz)
     if search_type == 'product':
-        regex_pattern_string = \
-            '^L[C-T]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_(RT|T1|T2)(.tar){0,1}(.gz){0,1}$'
-        if no_partial_dls:
-            regex_pattern_aria = re.compile(regex_pattern_string.replace('$', '.aria2$'))
-            aria_tempfiles = [re.sub('\.tar\.aria2$', '', file_path.name) for file_path in file_paths
-                              if re.match(regex_pattern_aria, file_path.name)]
-
+        regex = PRODUCT_FILE_REGEX
     elif search_type == 'log':
-        regex_pattern_string = \
-            '^L[C-T]0[45789]_L1[A-Z]{2}_[0-9]{6}_[0-9]{8}_[0-9]{8}_0[12]_(RT|T1|T2)(.tar){0,1}(.log)$'
+        regex = LOG_FILE_REGEX
     else:
         raise ValueError(f'Error: invalid search_type specified. Received {search_type}, expected "product" or "log".')
-
-    regex_pattern = re.compile(regex_pattern_string)
-
-    scene_names = []
-    for filepath in file_paths:
-        filename = filepath.name
-        if regex_pattern.match(filename):
-            suffixes = ''.join(filepath.suffixes)
-            filename = str(filename).replace(suffixes, '')
-            if no_partial_dls and search_type == 'product':
-                if filename not in aria_tempfiles:
-                    scene_names.append(filename)
-            else:
-                scene_names.append(filename)
-
+    prune = search_type == 'product'
+
+    scene_names = set()
+    aria_tempfiles = set()
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        level = [search_path]
+        while level:
+            subdirs = []
+            for matches, dirs in executor.map(lambda path: scan_directory(path, regex, prune), level):
+                for match in matches:
+                    if search_type == 'product' and match.group(2):
+                        aria_tempfiles.add(match.group(1))
+                    else:
+                        scene_names.add(match.group(1))
+                subdirs.extend(dirs)
+            level = subdirs if recursive else []
+
+    if no_partial_dls:
+        scene_names -= aria_tempfiles
     return scene_names
 
 
@@ -102,11 +126,8 @@ def load_tile_list(file_path: str) -> list:
 
 
 def filter_results_by_pr(scene_response: list, pr_list: list) -> list:
-    filtered_scene_response = []
-    for result in scene_response:
-        if result['displayId'][10:16] in pr_list:
-            filtered_scene_response.append(result)
-    return filtered_scene_response
+    pr_set = set(pr_list)
+    return [result for result in scene_response if result['displayId'][10:16] in pr_set]
 
 
 def load_secret(file_path: str) -> list:
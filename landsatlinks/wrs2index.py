@@ -0,0 +1,262 @@
+import os
+import struct
+import sys
+import zlib
+from array import array
+from functools import lru_cache
+
+# Compact binary index of the WRS-2 footprints for point and bounding box AOIs, built from the WRS-2 GeoPackage with
+# build_index (python -m landsatlinks.wrs2index). Queries only need the standard library, no GDAL.
+WRS2_INDEX_FP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'landsat_wrs2.idx')
+MAGIC = b'WRS2IDX1'
+# magic, number of footprints, rings, vertices, grid columns, grid rows, grid origin (lon, lat), grid cell size
+HEADER = struct.Struct('<8s5I3d')
+# grid cell size in degrees, about the size of a WRS-2 footprint at the equator
+CELL_SIZE = 2.0
+
+
+class Wrs2Index(object):
+    """
+    WRS-2 footprints as flat arrays: PRFIDs, the rings of each footprint, the vertices (lon/lat) of each ring, the
+    bounding box of each footprint, and a regular grid listing the footprints overlapping each cell.
+    Footprints crossing the antimeridian are stored with longitudes beyond 180° and are queried at lon + 360 as well.
+    """
+
+    def __init__(self, fp: str = WRS2_INDEX_FP):
+        with open(fp, 'rb') as f:
+            data = f.read()
+        magic, n_footprints, n_rings, n_vertices, self.nx, self.ny, self.x0, self.y0, self.cell_size = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f'{fp} is not a WRS-2 index file.')
+        body = memoryview(zlib.decompress(data[HEADER.size:]))
+
+        offset = 0
+
+        def read(typecode, n):
+            nonlocal offset
+            values = array(typecode)
+            values.frombytes(body[offset:offset + n * values.itemsize])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            offset += n * values.itemsize
+            return values
+
+        self.prfids = read('I', n_footprints)
+        self.ring_start = read('I', n_footprints + 1)
+        self.vertex_start = read('I', n_rings + 1)
+        self.vertices = read('f', 2 * n_vertices)
+        self.bboxes = read('f', 4 * n_footprints)
+        self.cell_start = read('I', self.nx * self.ny + 1)
+        self.cell_items = read('I', self.cell_start[-1])
+
+    def __len__(self):
+        return len(self.prfids)
+
+    def prfid(self, i: int) -> str:
+        return f'{self.prfids[i]:06d}'
+
+    def candidates(self, x_min: float, y_min: float, x_max: float, y_max: float) -> set:
+        """Footprints whose bounding box intersects the box, selected through the grid."""
+        col_min = max(int((x_min - self.x0) // self.cell_size), 0)
+        col_max = min(int((x_max - self.x0) // self.cell_size), self.nx - 1)
+        row_min = max(int((y_min - self.y0) // self.cell_size), 0)
+        row_max = min(int((y_max - self.y0) // self.cell_size), self.ny - 1)
+        found = set()
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                cell = row * self.nx + col
+                found.update(self.cell_items[self.cell_start[cell]:self.cell_start[cell + 1]])
+        bboxes = self.bboxes
+        return {
+            i for i in found
+            if bboxes[4 * i] <= x_max and bboxes[4 * i + 2] >= x_min
+            and bboxes[4 * i + 1] <= y_max and bboxes[4 * i + 3] >= y_min
+        }
+
+    def rings(self, i: int):
+        """Vertices of the rings of a footprint as flat lists [x0, y0, x1, y1, ...]."""
+        for ring in range(self.ring_start[i], self.ring_start[i + 1]):
+            yield self.vertices[2 * self.vertex_start[ring]:2 * self.vertex_start[ring + 1]]
+
+    def contains(self, i: int, x: float, y: float) -> bool:
+        """Point in polygon test (even-odd rule over all rings, so holes and multipolygons work)."""
+        inside = False
+        for ring in self.rings(i):
+            n = len(ring) // 2
+            x1, y1 = ring[2 * n - 2], ring[2 * n - 1]
+            for k in range(n):
+                x2, y2 = ring[2 * k], ring[2 * k + 1]
+                if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+                    inside = not inside
+                x1, y1 = x2, y2
+        return inside
+
+    def intersects(self, i: int, x_min: float, y_min: float, x_max: float, y_max: float) -> bool:
+        """Polygon/box intersection: an edge of the footprint crosses the box, or the box lies inside it."""
+        for ring in self.rings(i):
+            n = len(ring) // 2
+            x1, y1 = ring[2 * n - 2], ring[2 * n - 1]
+            for k in range(n):
+                x2, y2 = ring[2 * k], ring[2 * k + 1]
+                if segment_intersects_box(x1, y1, x2, y2, x_min, y_min, x_max, y_max):
+                    return True
+                x1, y1 = x2, y2
+        return self.contains(i, x_min, y_min)
+
+    def tiles_at_points(self, points: list) -> set:
+        """
+        :param points: list of (lon, lat) tuples
+        :return: set of PRFIDs (PPPRRR) of the footprints containing any of the points
+        """
+        pr_set = set()
+        for lon, lat in points:
+            for x in (lon, lon + 360):
+                for i in self.candidates(x, lat, x, lat):
+                    if self.contains(i, x, lat):
+                        pr_set.add(self.prfid(i))
+        return pr_set
+
+    def tiles_in_bbox(self, lon_min: float, lat_min: float, lon_max: float, lat_max: float) -> set:
+        """
+        Boxes with lon_min > lon_max cross the antimeridian.
+        :return: set of PRFIDs (PPPRRR) of the footprints intersecting the box
+        """
+        if lon_min > lon_max:
+            boxes = [(lon_min, lon_max + 360), (lon_min - 360, lon_max)]
+        else:
+            boxes = [(lon_min, lon_max), (lon_min + 360, lon_max + 360)]
+        pr_set = set()
+        for x_min, x_max in boxes:
+            for i in self.candidates(x_min, lat_min, x_max, lat_max):
+                if self.intersects(i, x_min, lat_min, x_max, lat_max):
+                    pr_set.add(self.prfid(i))
+        return pr_set
+
+
+def segment_intersects_box(x1, y1, x2, y2, x_min, y_min, x_max, y_max) -> bool:
+    """Liang-Barsky clipping of the segment (x1, y1) - (x2, y2) to the box."""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - x_min), (dx, x_max - x1), (-dy, y1 - y_min), (dy, y_max - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                if t > t1:
+                    return False
+                t0 = max(t0, t)
+            else:
+                if t < t0:
+                    return False
+                t1 = min(t1, t)
+    return True
+
+
+@lru_cache(maxsize=None)
+def load_index(fp: str = WRS2_INDEX_FP) -> Wrs2Index:
+    """Load the WRS-2 index once per process, e.g. for many batch jobs."""
+    if not os.path.isfile(fp):
+        print(f'Error: WRS-2 index not found at {fp}.\n'
+              f'Build it from the WRS-2 GeoPackage with "python -m landsatlinks.wrs2index".')
+        exit(1)
+    return Wrs2Index(fp)
+
+
+def build_index(gpkg_fp: str, index_fp: str = WRS2_INDEX_FP, cell_size: float = CELL_SIZE) -> int:
+    """
+    Build the index from the WRS-2 GeoPackage (requires GDAL).
+    :param gpkg_fp: WRS-2 footprints with the field PRFID (PPPRRR)
+    :param index_fp: output file
+    :param cell_size: grid cell size in degrees
+    :return: number of footprints
+    """
+    from osgeo import ogr, osr
+
+    wrs_ds = ogr.Open(gpkg_fp)
+    wrs_layer = wrs_ds.GetLayer()
+    wgs84 = osr.SpatialReference()
+    wgs84.ImportFromEPSG(4326)
+    wgs84.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    transform = None
+    wrs_srs = wrs_layer.GetSpatialRef()
+    if wrs_srs and not wrs_srs.IsSame(wgs84):
+        wrs_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+        transform = osr.CoordinateTransformation(wrs_srs, wgs84)
+
+    # rings of all features of each footprint
+    footprints = {}
+    for feat in wrs_layer:
+        geom = feat.GetGeometryRef()
+        if geom is None or geom.IsEmpty():
+            continue
+        geom = geom.Clone()
+        if transform:
+            geom.Transform(transform)
+        if ogr.GT_Flatten(geom.GetGeometryType()) == ogr.wkbPolygon:
+            polygons = [geom]
+        else:
+            polygons = [geom.GetGeometryRef(i) for i in range(geom.GetGeometryCount())]
+        rings = footprints.setdefault(int(feat.GetField('PRFID')), [])
+        for polygon in polygons:
+            for j in range(polygon.GetGeometryCount()):
+                rings.append([point[:2] for point in polygon.GetGeometryRef(j).GetPoints()])
+    wrs_ds = None
+
+    prfids, ring_start, vertex_start, vertices, bboxes = \
+        array('I'), array('I', [0]), array('I', [0]), array('f'), []
+    for prfid, rings in sorted(footprints.items()):
+        lons = [lon for ring in rings for lon, _ in ring]
+        # footprints crossing the antimeridian get continuous longitudes beyond 180°
+        shift = max(lons) - min(lons) > 180
+        x_min = y_min = float('inf')
+        x_max = y_max = float('-inf')
+        for ring in rings:
+            for lon, lat in ring:
+                if shift and lon < 0:
+                    lon += 360
+                vertices.extend((lon, lat))
+                x_min, x_max, y_min, y_max = min(x_min, lon), max(x_max, lon), min(y_min, lat), max(y_max, lat)
+            vertex_start.append(len(vertices) // 2)
+        prfids.append(prfid)
+        ring_start.append(len(vertex_start) - 1)
+        bboxes.append((x_min, y_min, x_max, y_max))
+
+    x0, y0 = -180.0, -90.0
+    nx = int(-(-(max(bbox[2] for bbox in bboxes) - x0) // cell_size))
+    ny = int(-(-(90 - y0) // cell_size))
+    cells = [[] for _ in range(nx * ny)]
+    for i, (x_min, y_min, x_max, y_max) in enumerate(bboxes):
+        for row in range(max(int((y_min - y0) // cell_size), 0), min(int((y_max - y0) // cell_size), ny - 1) + 1):
+            for col in range(max(int((x_min - x0) // cell_size), 0), min(int((x_max - x0) // cell_size), nx - 1) + 1):
+                cells[row * nx + col].append(i)
+    cell_start, cell_items = array('I', [0]), array('I')
+    for cell in cells:
+        cell_items.extend(cell)
+        cell_start.append(len(cell_items))
+
+    sections = [prfids, ring_start, vertex_start, vertices, array('f', [v for bbox in bboxes for v in bbox]),
+                cell_start, cell_items]
+    if sys.byteorder == 'big':
+        for section in sections:
+            section.byteswap()
+    header = HEADER.pack(MAGIC, len(prfids), len(vertex_start) - 1, len(vertices) // 2, nx, ny, x0, y0, cell_size)
+    os.makedirs(os.path.dirname(os.path.abspath(index_fp)), exist_ok=True)
+    with open(index_fp, 'wb') as f:
+        f.write(header + zlib.compress(b''.join(section.tobytes() for section in sections), 9))
+    return len(prfids)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from landsatlinks.aoi import WRS2_FP
+
+    parser = argparse.ArgumentParser(description='Build the WRS-2 index used for point and bounding box AOIs.')
+    parser.add_argument('gpkg', nargs='?', default=WRS2_FP, help='WRS-2 GeoPackage. Default: the bundled grid')
+    parser.add_argument('index', nargs='?', default=WRS2_INDEX_FP, help='Output file. Default: the bundled index')
+    args = parser.parse_args()
+    n = build_index(args.gpkg, args.index)
+    print(f'WRS-2 index with {n} footprints written to {args.index}')
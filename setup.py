@@ -25,11 +25,12 @@ setup(
     keywords='landsat, usgs, m2m, api, download, earth observation, remote sensing',
     packages=find_packages(),
     install_requires=['requests', 'tqdm', 'gdal'],
+    extras_require={'fast': ['orjson'], 'async': ['aiohttp']},
     entry_points={
         'console_scripts': [
             'landsatlinks=landsatlinks.cli:main',
         ],
     },
     include_package_data=True,
-    package_data={'landsatlinks': ['assets/landsat_wrs2.gpkg']}
+    package_data={'landsatlinks': ['assets/landsat_wrs2.gpkg', 'assets/landsat_wrs2.idx']}
 )
\ No newline at end of file